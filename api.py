@@ -1,7 +1,16 @@
 # Import de bibliothèques
+import io
+import json
+import os
+import threading
+import time
+
 import flask
 from flask import request, jsonify
-from engine import Engine
+
+import handlers
+import jobs
+from metrics import Collected, Counter, EngineSampler, Histogram, Registry
 
 # URL FORMAT : curl -X POST https://zachvfx.pythonanywhere.com/api/v1/check_move/ -H "Content-Type: application/json" -d '{"fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1","from": "a2", "to": "b5"}'
 
@@ -11,8 +20,135 @@ app = flask.Flask(__name__)
 # Lancement du Débogueur
 app.config["DEBUG"] = True
 
-# Initialisation du moteur d'échecs
-engine = Engine()
+# Les calculs sont faits dans handlers.py, un moteur par requête en cours. Pour
+# utiliser tous les coeurs, lancer plusieurs processus, par exemple :
+# gunicorn -w 4 api:app, ou la variante asynchrone : uvicorn asgi:app
+
+# Métriques au format Prometheus, exposées sur /metrics
+registry = Registry()
+requests_total = registry.register(
+    Counter(
+        "chess_api_requests_total",
+        "Requests served",
+        ("route", "method", "status"),
+    )
+)
+request_seconds = registry.register(
+    Histogram(
+        "chess_api_request_duration_seconds",
+        "Time to build the response, up to the first byte of a stream",
+        ("route",),
+    )
+)
+sampler = EngineSampler(float(os.environ.get("CHESS_METRICS_SAMPLE_INTERVAL", 0.01)))
+if sampler.interval > 0:
+    sampler.start()
+
+
+def _cache_samples(field: str):
+    for name, cache in (("results", handlers.results), ("analyses", handlers.analyses)):
+        yield {"cache": name}, cache.stats()[field]
+
+
+for name, field, kind, help in (
+    ("chess_api_cache_hits_total", "hits", "counter", "Cache lookups answered"),
+    ("chess_api_cache_misses_total", "misses", "counter", "Cache lookups missed"),
+    ("chess_api_cache_hit_ratio", "hit_rate", "gauge", "Hits over all lookups"),
+    ("chess_api_cache_entries", "size", "gauge", "Entries held in the cache"),
+):
+    registry.register(
+        Collected(name, help, kind, lambda field=field: _cache_samples(field))
+    )
+registry.register(
+    Collected(
+        "chess_positions_loaded_total",
+        "FEN positions parsed into an engine, rate() gives positions per second",
+        "counter",
+        lambda: [({}, handlers.engines.positions_loaded)],
+    )
+)
+registry.register(
+    Collected(
+        "chess_engine_sampled_seconds_total",
+        "Engine time by phase, estimated from stack samples",
+        "counter",
+        lambda: [({"phase": k}, v) for k, v in sampler.seconds().items()],
+    )
+)
+
+# File des analyses longues, créée à la première soumission
+_job_queue: jobs.JobQueue | None = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> jobs.JobQueue:
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = jobs.JobQueue(
+                workers=int(os.environ.get("CHESS_JOB_WORKERS", 0)) or None,
+                max_running_per_client=int(
+                    os.environ.get("CHESS_JOB_RUNNING_PER_CLIENT", 2)
+                ),
+                max_pending_per_client=int(
+                    os.environ.get("CHESS_JOB_PENDING_PER_CLIENT", 20)
+                ),
+                max_finished=int(os.environ.get("CHESS_JOB_RESULTS", 1000)),
+            )
+        return _job_queue
+
+
+def _job_samples():
+    if _job_queue is not None:
+        for state, count in _job_queue.stats().items():
+            if state != "workers":
+                yield {"state": state}, count
+
+
+registry.register(
+    Collected("chess_api_jobs", "Analysis jobs by state", "gauge", _job_samples)
+)
+
+
+@app.before_request
+def start_timer():
+    flask.g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response: flask.Response) -> flask.Response:
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - flask.g.request_start
+    requests_total.inc((route, request.method, str(response.status_code)))
+    request_seconds.observe(elapsed, (route,))
+    return response
+
+
+def json_response(payload: dict) -> flask.Response:
+    """
+    A JSON response with a strong ETag
+
+    GET requests whose If-None-Match matches get an empty 304 instead.
+    """
+    body, etag = handlers.encode(payload)
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def respond(status: int, payload: dict):
+    """Response of a handler, errors are sent without an ETag"""
+    if status != 200:
+        return jsonify(payload), status
+    return json_response(payload)
+
+
+def request_data() -> dict:
+    """Parameters of the request: the query string of a GET, else the JSON body"""
+    if request.method == "GET":
+        return request.args.to_dict()
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
 
 
 @app.route("/", methods=["GET"])
@@ -20,40 +156,116 @@ def home():
     return """<h1>A chess engine by Zach</h1>"""
 
 
-@app.route("/api/v1/get_legal_moves/", methods=["POST"])
+@app.route("/api/v1/get_legal_moves/", methods=["GET", "POST"])
 def get_legal_moves():
-    data = request.get_json()
-    position = data.get("position")
-    if position is None:
-        return jsonify({"error": "Position is required"}), 400
+    return respond(*handlers.get_legal_moves(request_data()))
 
-    try:
-        position = int(position)
-        legal_moves = engine.get_legal_moves(position)
-        return jsonify({"legal_moves": legal_moves})
-    except ValueError:
-        return jsonify({"error": "Invalid position"}), 400
+
+@app.route("/api/v1/legal_moves/", methods=["GET", "POST"])
+def legal_moves():
+    """Legal moves of every piece of the side to move, for any position"""
+    return respond(*handlers.legal_moves(request_data()))
 
 
-@app.route("/api/v1/check_move/", methods=["POST"])
+@app.route("/api/v1/check_move/", methods=["GET", "POST"])
 def check_move():
-    data = request.get_json()
-    fen = data.get("fen")
-    from_pos = data.get("from")
-    to_pos = data.get("to")
+    return respond(*handlers.check_move(request_data()))
 
-    if not fen or from_pos is None or to_pos is None:
-        return jsonify({"error": "FEN, from, and to positions are required"}), 400
 
+@app.route("/api/v1/check_moves/", methods=["POST"])
+def check_moves():
+    """Validate many moves in one request, see handlers.check_moves"""
+    return respond(*handlers.check_moves(request_data()))
+
+
+@app.route("/api/v1/best_move/", methods=["GET", "POST"])
+def best_move():
+    """Best move, score and principal variation within a depth or time budget"""
+    return respond(*handlers.best_move(request_data()))
+
+
+@app.route("/api/v1/analyse_pgn/", methods=["POST"])
+def analyse_pgn():
+    """
+    Replay the games of a PGN body, streaming one JSON line per ply
+
+    ?depth=0 adds the static evaluation of every position, ?depth=N a search.
+    """
+    try:
+        depth = handlers.parse_eval_depth(request.args.get("depth"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Le corps est lu au fur et à mesure, jamais en entier
+    source = io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace")
+    lines = (
+        json.dumps(record) + "\n" for record in handlers.analyse_games(source, depth)
+    )
+    return flask.Response(
+        flask.stream_with_context(lines), mimetype="application/x-ndjson"
+    )
+
+
+@app.route("/api/v1/check_puzzles/", methods=["POST"])
+def check_puzzles():
+    """Check that puzzles have a unique winning line, see handlers.check_puzzles"""
+    return respond(*handlers.check_puzzles(request_data()))
+
+
+@app.route("/api/v1/explorer/", methods=["POST"])
+def explorer():
+    return respond(*handlers.explorer(request_data()))
+
+
+@app.route("/api/v1/cache_stats/", methods=["GET"])
+def cache_stats():
+    return respond(*handlers.cache_stats(request_data()))
+
+
+# X-Client-Id est choisi par le client : il ne compte que derrière un proxy de
+# confiance qui le fixe lui-même (CHESS_TRUST_CLIENT_ID=1)
+TRUST_CLIENT_ID = os.environ.get("CHESS_TRUST_CLIENT_ID") == "1"
+
+
+def client_id() -> str:
+    """Who a request comes from, for the per-client job limits"""
+    if TRUST_CLIENT_ID and request.headers.get("X-Client-Id"):
+        return request.headers["X-Client-Id"]
+    return request.remote_addr or "unknown"
+
+
+@app.route("/api/v1/jobs", methods=["POST"], strict_slashes=False)
+def submit_job():
+    """Queue a long analysis, its progress is polled with GET on its URL"""
     try:
-        from_pos = engine._get_index_from_pgn(from_pos)
-        to_pos = engine._get_index_from_pgn(to_pos)
-        engine.load_fen_notation(fen)
-        legal_moves = engine.get_legal_moves(from_pos)
-        is_legal = to_pos in legal_moves
-        return jsonify({"is_legal": is_legal})
-    except ValueError:
-        return jsonify({"error": "Invalid positions"}), 400
+        job_type, params, cost = jobs.prepare(request_data())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job = get_job_queue().submit(job_type, params, cost, client_id())
+    except jobs.JobRejected as e:
+        if e.client_limit:
+            return jsonify({"error": str(e)}), 429
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    location = flask.url_for("get_job", job_id=job.id)
+    return jsonify({"id": job.id, "status": job.status}), 202, {"Location": location}
+
+
+@app.route("/api/v1/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    job = get_job_queue().describe(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return flask.Response(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+"""
+Asynchronous variant of the engine API, for any ASGI server: uvicorn asgi:app
+
+Connections are served on the event loop, where an idle keep-alive connection
+costs little more than its socket. Engine work runs in a process pool of one
+worker per core, so CPU-bound requests never block the loop nor exceed the
+cores. Requests beyond the workers wait in the pool queue up to the configured
+depth, then the server answers 503 instead of piling up work it cannot do in
+time.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qsl
+
+import handlers
+
+# Engine processes, one per core by default
+WORKERS = int(os.environ.get("CHESS_ASGI_WORKERS", 0)) or os.cpu_count() or 1
+
+# Requests allowed to wait for a worker, per worker
+QUEUE_DEPTH = int(os.environ.get("CHESS_ASGI_QUEUE_DEPTH", 4))
+
+# Largest request body accepted
+MAX_BODY_BYTES = 1 << 20
+
+# Seconds a client is asked to wait after a 503
+RETRY_AFTER = 1
+
+HOME_PAGE = b"<h1>A chess engine by Zach</h1>"
+
+
+def _parse_query(query_string: bytes) -> dict:
+    """Query parameters, the first value of each like Flask's args.to_dict()"""
+    data: dict[str, str] = {}
+    for key, value in parse_qsl(query_string.decode("latin-1")):
+        data.setdefault(key, value)
+    return data
+
+
+def _parse_body(body: bytes) -> dict:
+    """The JSON object of a body, empty if there is none like the Flask API"""
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class EngineApp:
+    """
+    ASGI application serving the routes of handlers.py
+
+    Args:
+        workers (int): Engine processes
+        queue_depth (int): Requests allowed to wait per worker before the
+            server answers 503
+    """
+
+    def __init__(self, workers: int = WORKERS, queue_depth: int = QUEUE_DEPTH):
+        self.workers = workers
+        self.max_in_flight = workers * (1 + queue_depth)
+        self.in_flight = 0
+        self.rejected = 0
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Created on first use too, for servers without lifespan support
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        return self._pool
+
+    def start(self) -> None:
+        """Start the workers before the first request instead of during it"""
+        list(self.pool.map(handlers.warm_up, range(self.workers)))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.start)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.shutdown)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: dict, receive, send) -> None:
+        method = scope["method"]
+        path = scope["path"]
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+
+        if path == "/" and method in ("GET", "HEAD"):
+            await self._send(send, method, 200, HOME_PAGE, "text/html; charset=utf-8")
+            return
+        route = handlers.ROUTES.get(path)
+        if route is None:
+            await self._send_json(send, method, 404, {"error": "Not found"})
+            return
+        methods = route[0]
+        if method not in methods and not (method == "HEAD" and "GET" in methods):
+            await self._send_json(
+                send,
+                method,
+                405,
+                {"error": "Method not allowed"},
+                [(b"allow", ", ".join(methods).encode())],
+            )
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if len(body) > MAX_BODY_BYTES:
+                await self._send_json(send, method, 413, {"error": "Body too large"})
+                return
+            if not message.get("more_body", False):
+                break
+
+        if method in ("GET", "HEAD"):
+            data = _parse_query(scope.get("query_string", b""))
+        else:
+            data = _parse_body(bytes(body))
+
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            await self._send_json(
+                send,
+                method,
+                503,
+                {"error": "Server busy, retry later"},
+                [(b"retry-after", str(RETRY_AFTER).encode())],
+            )
+            return
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            status, payload = await loop.run_in_executor(
+                self.pool, handlers.dispatch, path, data
+            )
+        except BrokenProcessPool:
+            # A worker died, the next request starts a new pool
+            self._pool = None
+            status, payload = 503, {"error": "Engine workers restarting"}
+        except Exception:
+            status, payload = 500, {"error": "Internal error"}
+        finally:
+            self.in_flight -= 1
+
+        if status != 200:
+            await self._send_json(send, method, status, payload)
+            return
+        body, etag = handlers.encode(payload)
+        etag = f'"{etag}"'
+        if method in ("GET", "HEAD") and _etag_matches(
+            headers.get("if-none-match", ""), etag
+        ):
+            await self._send(send, method, 304, b"", None, [(b"etag", etag.encode())])
+            return
+        await self._send(
+            send, method, 200, body, "application/json", [(b"etag", etag.encode())]
+        )
+
+    async def _send_json(
+        self, send, method: str, status: int, payload: dict, headers=()
+    ) -> None:
+        body = json.dumps(payload).encode()
+        await self._send(send, method, status, body, "application/json", headers)
+
+    async def _send(
+        self,
+        send,
+        method: str,
+        status: int,
+        body: bytes,
+        content_type: str | None,
+        headers=(),
+    ) -> None:
+        response_headers = list(headers)
+        if content_type is not None:
+            response_headers.append((b"content-type", content_type.encode()))
+        if status != 304:
+            response_headers.append((b"content-length", str(len(body)).encode()))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": response_headers,
+            }
+        )
+        await send(
+            {"type": "http.response.body", "body": b"" if method == "HEAD" else body}
+        )
+
+
+app = EngineApp()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app)
@@ -1,22 +1,12 @@
-from piece import Piece, Color, PieceType
-from pydantic import RootModel
+from core import Piece, Color, PieceType
 
 CHAR_TO_COLUMN = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
 COLUMN_TO_CHAR = {v: k for k, v in CHAR_TO_COLUMN.items()}
 
 
-class BoardPieceList(RootModel):
-    root: list[Piece]
-
-
 class Board:
     def __init__(self):
-        self.board: BoardPieceList = BoardPieceList(
-            root=[
-                Piece(piece_type=PieceType.EMPTY, board_index=i, color=Color.EMPTY)
-                for i in range(64)
-            ]
-        )
+        self.board: list[Piece] = self.clear_board()
         self.active_color: Color = Color.WHITE
         self.white_can_castle_queen_side: bool = False
         self.white_can_castle_king_side: bool = False
@@ -25,10 +15,15 @@ class Board:
         self.half_move: int = 0
         self.full_move: int = 1
         self.en_passant_target: str | None = None
+        # Bumped whenever the position changes, used to invalidate cached queries
+        self.move_counter: int = 0
 
     def _move(self, from_: int, to_: int) -> None:
-        self.board[to_] = self.board[from_]
-        self.board[to_].board_index = to_
+        # Pieces are never mutated, so saved boards can share them
+        moved = self.board[from_]
+        self.board[to_] = Piece(
+            piece_type=moved.piece_type, board_index=to_, color=moved.color
+        )
         self.board[from_] = Piece(
             piece_type=PieceType.EMPTY, board_index=from_, color=Color.EMPTY
         )
@@ -128,6 +123,56 @@ class Board:
                 )
                 board_index += 1
 
+        self.move_counter += 1
+
+    def get_fen_notation(self) -> str:
+        """Get the fen string of the current position
+
+        Returns:
+            str: The fen string, in the format read by load_fen_notation
+        """
+        rows = []
+        for row in range(8):
+            row_str = ""
+            empty = 0
+            for col in range(8):
+                piece: Piece = self.board[row * 8 + col]
+                if piece.piece_type == PieceType.EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row_str += str(empty)
+                    empty = 0
+                row_str += (
+                    piece.piece_type.value.upper()
+                    if piece.color == Color.WHITE
+                    else piece.piece_type.value
+                )
+            if empty:
+                row_str += str(empty)
+            rows.append(row_str)
+
+        castling = ""
+        if self.white_can_castle_king_side:
+            castling += "K"
+        if self.white_can_castle_queen_side:
+            castling += "Q"
+        if self.black_can_castle_king_side:
+            castling += "k"
+        if self.black_can_castle_queen_side:
+            castling += "q"
+
+        return " ".join(
+            (
+                "/".join(rows),
+                "w" if self.active_color == Color.WHITE else "b",
+                castling or "-",
+                self.en_passant_target or "-",
+                str(self.half_move),
+                str(self.full_move),
+            )
+        )
+
     def print_current_board(self) -> None:
         show_row = 8
         for row in range(8):
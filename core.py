@@ -0,0 +1,35 @@
+from enum import Enum
+
+
+class Color(Enum):
+    EMPTY = 0
+    WHITE = 1
+    BLACK = 2
+
+
+class PieceType(str, Enum):
+    PAWN = "p"
+    KNIGHT = "n"
+    BISHOP = "b"
+    ROOK = "r"
+    QUEEN = "q"
+    KING = "k"
+    EMPTY = "0"
+
+
+class Piece:
+    """A piece on the board, kept free of any third party dependency
+
+    The pydantic model with the same fields in piece.py is the wire format,
+    build it with from_attributes=True to serialize a board.
+    """
+
+    __slots__ = ("piece_type", "board_index", "color")
+
+    def __init__(self, piece_type: PieceType, board_index: int, color: Color):
+        self.piece_type = piece_type
+        self.board_index = board_index
+        self.color = color
+
+    def __repr__(self) -> str:
+        return f"{self.color.name} {self.piece_type.name}"
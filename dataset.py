@@ -0,0 +1,286 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+from core import Color, PieceType
+from engine import PIECE_INDEX, Engine
+from pgn import PgnGame, read_games
+
+# Bump whenever the record layout changes
+DATASET_VERSION = 1
+DATASET_MAGIC = b"CHESSPOS"
+HEADER = struct.Struct("<8sIIQ")  # magic, version, record size, record count
+HEADER_SIZE = 64  # The header is padded so records start aligned
+
+# One position per record. Pieces are 4-bit codes, two squares per byte with
+# the lower board index in the low nibble: 0 empty, 1-6 white pawn to king,
+# 7-12 black pawn to king (PIECE_INDEX order).
+RECORD_DTYPE = np.dtype(
+    [
+        ("pieces", np.uint8, (32,)),
+        ("white_to_move", np.uint8),
+        ("result", np.int8),  # 1 white won, 0 draw, -1 black won
+    ]
+)
+
+GAME_RESULTS = {"1-0": 1, "1/2-1/2": 0, "0-1": -1}
+
+# Records buffered in memory before being written out
+WRITE_BATCH = 65536
+
+
+def piece_codes(engine: Engine) -> list[int]:
+    """The 4-bit code of every square of a position, in board order"""
+    codes = []
+    for p in engine.board:
+        if p.piece_type == PieceType.EMPTY:
+            codes.append(0)
+        else:
+            codes.append(
+                PIECE_INDEX[p.piece_type] + (1 if p.color == Color.WHITE else 7)
+            )
+    return codes
+
+
+def pack_codes(codes: np.ndarray) -> np.ndarray:
+    """(N, 64) piece codes -> (N, 32) bytes, two squares per byte"""
+    codes = np.asarray(codes, dtype=np.uint8)
+    return codes[:, 0::2] | (codes[:, 1::2] << 4)
+
+
+def unpack_codes(pieces: np.ndarray) -> np.ndarray:
+    """(N, 32) packed bytes -> (N, 64) piece codes"""
+    pieces = np.asarray(pieces, dtype=np.uint8)
+    codes = np.empty((len(pieces), 64), dtype=np.uint8)
+    codes[:, 0::2] = pieces & 0x0F
+    codes[:, 1::2] = pieces >> 4
+    return codes
+
+
+def records_to_planes(records: np.ndarray) -> np.ndarray:
+    """
+    Decode records into the one-hot planes used by batch.BatchEvaluator
+
+    Args:
+        records (np.ndarray): Records, typically a slice of open_dataset
+
+    Returns:
+        np.ndarray: (N, 12, 64) uint8, plane color * 6 + PIECE_INDEX
+    """
+    codes = unpack_codes(records["pieces"])
+    planes = codes[:, None, :] == np.arange(1, 13, dtype=np.uint8)[None, :, None]
+    return planes.astype(np.uint8)
+
+
+def game_records(
+    game: PgnGame, engine: Engine | None = None, skip_plies: int = 0
+) -> np.ndarray:
+    """
+    Replay a game and record every position with the final result
+
+    Games without a decisive or drawn result, or with an illegal move, give
+    no records since their outcome cannot be trusted.
+
+    Args:
+        game (PgnGame): The game to replay
+        engine (Engine | None): Engine to reuse, a new one is created if None
+        skip_plies (int): Opening plies left out of the dataset
+
+    Returns:
+        np.ndarray: Records of RECORD_DTYPE, one per position
+    """
+    result = GAME_RESULTS.get(game.result)
+    if result is None:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    engine = engine or Engine()
+    codes: list[list[int]] = []
+    sides: list[bool] = []
+    try:
+        if game.start_fen:
+            engine.load_fen_notation(game.start_fen)
+        else:
+            engine.load_fen_notation()
+        for ply, san in enumerate(game.moves):
+            if ply >= skip_plies:
+                codes.append(piece_codes(engine))
+                sides.append(engine.active_color == Color.WHITE)
+            engine.make_move(*engine.san_to_move(san))
+    except (ValueError, KeyError, IndexError):
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    # The final position is part of the game as well
+    if len(game.moves) >= skip_plies:
+        codes.append(piece_codes(engine))
+        sides.append(engine.active_color == Color.WHITE)
+
+    records = np.zeros(len(codes), dtype=RECORD_DTYPE)
+    if codes:
+        records["pieces"] = pack_codes(np.array(codes, dtype=np.uint8))
+        records["white_to_move"] = sides
+        records["result"] = result
+    return records
+
+
+# One engine per worker process, reused for every game it replays
+_worker_engine: Engine | None = None
+
+
+def _records_in_worker(args: tuple[PgnGame, int]) -> np.ndarray:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine()
+    game, skip_plies = args
+    return game_records(game, _worker_engine, skip_plies)
+
+
+def iter_game_records(
+    games: Iterable[PgnGame],
+    processes: int | None = None,
+    chunksize: int = 64,
+    skip_plies: int = 0,
+) -> Iterator[np.ndarray]:
+    """
+    Records of every game, replayed across a pool of worker processes
+
+    Args:
+        games (Iterable[PgnGame]): The games, typically from read_games
+        processes (int | None): Worker count, defaults to the CPU count
+        chunksize (int): Games sent to a worker at a time
+        skip_plies (int): Opening plies left out of the dataset
+
+    Returns:
+        Iterator[np.ndarray]: The records of each game, in game order
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1:
+        engine = Engine()
+        for game in games:
+            yield game_records(game, engine, skip_plies)
+        return
+
+    games = iter(games)
+    batch_size = processes * chunksize * 4
+    with multiprocessing.Pool(processes) as pool:
+        while batch := list(itertools.islice(games, batch_size)):
+            tasks = [(game, skip_plies) for game in batch]
+            yield from pool.imap(_records_in_worker, tasks, chunksize)
+
+
+def write_dataset(path: Path, chunks: Iterable[np.ndarray]) -> int:
+    """
+    Stream records to a dataset file, replacing any existing one atomically
+
+    Only WRITE_BATCH records are held in memory at a time, the count in the
+    header is filled in once every record is written.
+
+    Args:
+        path (Path): Destination file
+        chunks (Iterable[np.ndarray]): Arrays of RECORD_DTYPE records
+
+    Returns:
+        int: Number of records written
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(bytes(HEADER_SIZE))
+            pending: list[np.ndarray] = []
+            pending_count = 0
+            for chunk in chunks:
+                pending.append(chunk)
+                pending_count += len(chunk)
+                if pending_count >= WRITE_BATCH:
+                    np.concatenate(pending).tofile(f)
+                    count += pending_count
+                    pending, pending_count = [], 0
+            if pending:
+                np.concatenate(pending).tofile(f)
+                count += pending_count
+
+            header = HEADER.pack(
+                DATASET_MAGIC, DATASET_VERSION, RECORD_DTYPE.itemsize, count
+            )
+            f.seek(0)
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return count
+
+
+def open_dataset(path: Path) -> np.memmap:
+    """
+    Map a dataset file without reading it
+
+    Args:
+        path (Path): File written by write_dataset
+
+    Raises:
+        ValueError: If the file is not a dataset of this version
+
+    Returns:
+        np.memmap: Read-only records of RECORD_DTYPE
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    try:
+        magic, version, record_size, count = HEADER.unpack(header)
+    except struct.error:
+        raise ValueError(f"{path} is not a position dataset")
+    if magic != DATASET_MAGIC:
+        raise ValueError(f"{path} is not a position dataset")
+    if version != DATASET_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has unsupported dataset version {version}")
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(
+        path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export the positions of a PGN archive as a training dataset"
+    )
+    parser.add_argument("pgn", type=Path, help="PGN file to replay")
+    parser.add_argument("output", type=Path, help="Dataset file to write")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=64, help="Games per worker task"
+    )
+    parser.add_argument(
+        "--skip-plies", type=int, default=0, help="Opening plies to leave out"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    chunks = iter_game_records(
+        read_games(args.pgn), args.processes, args.chunksize, args.skip_plies
+    )
+    count = write_dataset(args.output, chunks)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{count} positions written to {args.output} in {elapsed:.2f}s "
+        f"({count / elapsed if elapsed else 0:.0f} positions/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,153 @@
+import re
+import threading
+from collections.abc import Iterator
+from enum import Enum
 from board import Board, Color, PieceType, Piece
+from tables import (
+    BISHOP_DIRECTION_INDEXES,
+    QUEEN_DIRECTION_INDEXES,
+    ROOK_DIRECTION_INDEXES,
+    get_tables,
+    iter_squares,
+)
+
+PROMOTION_PIECES = (
+    PieceType.QUEEN,
+    PieceType.ROOK,
+    PieceType.BISHOP,
+    PieceType.KNIGHT,
+)
+
+SAN_RE = re.compile(
+    r"^(?P<piece>[KQRBN])?"
+    r"(?P<from_file>[a-h])?(?P<from_rank>[1-8])?"
+    r"(?P<capture>x)?"
+    r"(?P<to>[a-h][1-8])"
+    r"(?:=?(?P<promotion>[QRBN]))?$"
+)
+UCI_RE = re.compile(r"^(?P<from>[a-h][1-8])(?P<to>[a-h][1-8])(?P<promotion>[qrbn])?$")
+
+# From index, to index and the piece a promoting pawn becomes
+Move = tuple[int, int, PieceType]
+
+# Starting square -> legal destination squares
+LegalMoveMap = dict[int, list[int]]
+
+PIECE_INDEX = {
+    PieceType.PAWN: 0,
+    PieceType.KNIGHT: 1,
+    PieceType.BISHOP: 2,
+    PieceType.ROOK: 3,
+    PieceType.QUEEN: 4,
+    PieceType.KING: 5,
+}
+
+
+class GameStatus(str, Enum):
+    ONGOING = "ongoing"
+    CHECKMATE = "checkmate"
+    STALEMATE = "stalemate"
+    DRAW_FIFTY_MOVES = "draw_fifty_moves"
+    DRAW_THREEFOLD_REPETITION = "draw_threefold_repetition"
+    DRAW_INSUFFICIENT_MATERIAL = "draw_insufficient_material"
+
+    @property
+    def is_over(self) -> bool:
+        return self != GameStatus.ONGOING
+
+    @property
+    def is_draw(self) -> bool:
+        return self not in (GameStatus.ONGOING, GameStatus.CHECKMATE)
 
 
 class Engine(Board):
     def __init__(self):
         super().__init__()
+        # Precomputed attack masks and hash keys, shared by every process
+        self.tables = get_tables()
+        self._status_cache: tuple[int, GameStatus] | None = None
+        self._legal_move_map_cache: tuple[int, Color, LegalMoveMap] | None = None
+        self._legal_move_index_cache: (
+            tuple[int, Color, dict[tuple[PieceType, int], list[int]]] | None
+        ) = None
+        self._position_counts: dict[int, int] = {}
+        # Saved state of every move made since the last load_fen_notation
+        self._history: list[tuple] = []
         self.load_fen_notation()
 
-    def _get_pawn_moves(self, position: int) -> list[int]:
-        moves = []
+    def load_fen_notation(
+        self, fen: str = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    ) -> None:
+        super().load_fen_notation(fen)
+        # A new game starts its own repetition history
+        self._position_counts = {self._get_position_key(): 1}
+        self._history = []
+
+    def zobrist_hash(self) -> int:
+        """
+        Returns a 64 bit hash of the position
+
+        Covers piece placement, side to move, castling rights and the en
+        passant file, using the keys of the shared lookup tables. As in
+        Polyglot the file only counts when an en passant capture is possible,
+        here when it is also legal.
+
+        Returns:
+            int: The hash of the position
+        """
+        keys = self.tables.zobrist_pieces
+        h = 0
+        for i, p in enumerate(self.board):
+            if p.piece_type != PieceType.EMPTY:
+                color_offset = 0 if p.color == Color.WHITE else 6
+                h ^= keys[(color_offset + PIECE_INDEX[p.piece_type]) * 64 + i]
+
+        castling = self.tables.zobrist_castling
+        if self.white_can_castle_king_side:
+            h ^= castling[0]
+        if self.white_can_castle_queen_side:
+            h ^= castling[1]
+        if self.black_can_castle_king_side:
+            h ^= castling[2]
+        if self.black_can_castle_queen_side:
+            h ^= castling[3]
+
+        ep_pos = self._capturable_en_passant()
+        if ep_pos is not None:
+            h ^= self.tables.zobrist_en_passant[ep_pos % 8]
+        if self.active_color == Color.BLACK:
+            h ^= self.tables.zobrist_side[0]
+        return h
+
+    def _capturable_en_passant(self) -> int | None:
+        """
+        The en passant square if a legal capture on it exists, else None
+
+        A double push the opponent cannot take back en passant leaves the
+        same position as a single step would have, so it must hash the same.
+        """
+        if self.en_passant_target is None:
+            return None
+        ep_pos = self._get_index_from_pgn(self.en_passant_target)
+        # The capturing pawns stand beside the pawn that moved two squares
+        captured_pos = ep_pos + (8 if self.active_color == Color.WHITE else -8)
+        for from_pos in (captured_pos - 1, captured_pos + 1):
+            if from_pos // 8 != captured_pos // 8:
+                continue
+            piece = self.board[from_pos]
+            if (
+                piece.piece_type == PieceType.PAWN
+                and piece.color == self.active_color
+                and not self._is_king_in_check_after_move(from_pos, ep_pos)
+            ):
+                return ep_pos
+        return None
+
+    def _get_position_key(self) -> int:
+        """Key identifying a position for repetition detection"""
+        return self.zobrist_hash()
+
+    def _iter_pawn_moves(self, position: int) -> Iterator[int]:
         piece = self.board[position]
         row, col = position // 8, position % 8
 
@@ -19,7 +159,7 @@ class Engine(Board):
         if 0 <= new_row < 8:
             new_pos = new_row * 8 + col
             if self.board[new_pos].piece_type == PieceType.EMPTY:
-                moves.append(new_pos)
+                yield new_pos
 
                 # Double move from starting position
                 if (piece.color == Color.WHITE and row == 6) or (
@@ -29,10 +169,15 @@ class Engine(Board):
                     if 0 <= new_row < 8:
                         new_pos = new_row * 8 + col
                         if self.board[new_pos].piece_type == PieceType.EMPTY:
-                            moves.append(new_pos)
+                            yield new_pos
 
         # Capture moves (diagonal)
-        for col_offset in [-1, 1]:
+        ep_pos = (
+            self._get_index_from_pgn(self.en_passant_target)
+            if self.en_passant_target is not None
+            else None
+        )
+        for col_offset in (-1, 1):
             new_col = col + col_offset
             new_row = row + direction
 
@@ -43,305 +188,225 @@ class Engine(Board):
 
                 # Regular capture
                 if target.piece_type != PieceType.EMPTY and target.color != piece.color:
-                    moves.append(new_pos)
+                    yield new_pos
 
                 # En passant capture
-                elif self.board:
-                    if self.en_passant_target is not None:
-                        ep_pos = self._get_index_from_pgn(self.en_passant_target)
-                        if new_pos == ep_pos:
-                            moves.append(new_pos)
-
-        return moves
+                elif new_pos == ep_pos:
+                    yield new_pos
 
-    def _get_knight_moves(self, position: int) -> list[int]:
-        moves = []
+    def _iter_knight_moves(self, position: int) -> Iterator[int]:
         piece = self.board[position]
-        row, col = position // 8, position % 8
-
-        # Knight moves in an L-shape: 2 squares in one direction, 1 square perpendicular
-        knight_moves = [
-            (-2, -1),
-            (-2, 1),
-            (2, -1),
-            (2, 1),  # 2 vertical, 1 horizontal
-            (-1, -2),
-            (-1, 2),
-            (1, -2),
-            (1, 2),  # 1 vertical, 2 horizontal
-        ]
-
-        for row_offset, col_offset in knight_moves:
-            new_row, new_col = row + row_offset, col + col_offset
-
-            # Check if the new position is on the board
-            if 0 <= new_row < 8 and 0 <= new_col < 8:
-                new_pos = new_row * 8 + new_col
-                target_piece = self.board[new_pos]
 
-                # Can move if square is empty or contains enemy piece
-                if (
-                    target_piece.piece_type == PieceType.EMPTY
-                    or target_piece.color != piece.color
-                ):
-                    moves.append(new_pos)
+        for new_pos in iter_squares(self.tables.knight_attacks[position]):
+            target_piece = self.board[new_pos]
 
-        return moves
+            # Can move if square is empty or contains enemy piece
+            if (
+                target_piece.piece_type == PieceType.EMPTY
+                or target_piece.color != piece.color
+            ):
+                yield new_pos
 
-    def _get_bishop_moves(self, position: int) -> list[int]:
-        moves = []
+    def _iter_sliding_moves(
+        self, position: int, direction_indexes: tuple[int, ...]
+    ) -> Iterator[int]:
         piece = self.board[position]
-        row, col = position // 8, position % 8
 
-        # Bishops move diagonally
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-
-        for row_dir, col_dir in directions:
-            new_row, new_col = row, col
-
-            # Continue moving in this direction until we hit the edge or another piece
-            while True:
-                new_row += row_dir
-                new_col += col_dir
-
-                # Check if we're still on the board
-                if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                    break
-
-                new_pos = new_row * 8 + new_col
+        for direction in direction_indexes:
+            # Continue along the ray until we hit the edge or another piece
+            for new_pos in self.tables.iter_ray(direction, position):
                 target_piece = self.board[new_pos]
 
                 # Empty square - valid move
                 if target_piece.piece_type == PieceType.EMPTY:
-                    moves.append(new_pos)
+                    yield new_pos
                     continue
 
                 # Enemy piece - valid move, but can't go further
                 if target_piece.color != piece.color:
-                    moves.append(new_pos)
+                    yield new_pos
 
                 # After hitting any piece (friend or foe), we can't continue in this direction
                 break
 
-        return moves
-
-    def _get_rook_moves(self, position: int) -> list[int]:
-        moves = []
-        piece = self.board[position]
-        row, col = position // 8, position % 8
+    def _iter_bishop_moves(self, position: int) -> Iterator[int]:
+        # Bishops move diagonally
+        return self._iter_sliding_moves(position, BISHOP_DIRECTION_INDEXES)
 
+    def _iter_rook_moves(self, position: int) -> Iterator[int]:
         # Rooks move horizontally and vertically
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-
-        for row_dir, col_dir in directions:
-            new_row, new_col = row, col
-
-            # Continue moving in this direction until we hit the edge or another piece
-            while True:
-                new_row += row_dir
-                new_col += col_dir
-
-                # Check if we're still on the board
-                if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                    break
-
-                new_pos = new_row * 8 + new_col
-                target_piece = self.board[new_pos]
-
-                # Empty square - valid move
-                if target_piece.piece_type == PieceType.EMPTY:
-                    moves.append(new_pos)
-                    continue
+        return self._iter_sliding_moves(position, ROOK_DIRECTION_INDEXES)
 
-                # Enemy piece - valid move, but can't go further
-                if target_piece.color != piece.color:
-                    moves.append(new_pos)
-
-                # After hitting any piece (friend or foe), we can't continue in this direction
-                break
-
-        return moves
-
-    def _get_queen_moves(self, position: int) -> list[int]:
+    def _iter_queen_moves(self, position: int) -> Iterator[int]:
         # Queen combines bishop and rook movements
         assert self.board[position].piece_type == PieceType.QUEEN
-        return self._get_bishop_moves(position) + self._get_rook_moves(position)
+        return self._iter_sliding_moves(position, QUEEN_DIRECTION_INDEXES)
 
-    def _get_king_moves(self, position: int) -> list[int]:
-        moves = []
+    def _iter_king_moves(self, position: int) -> Iterator[int]:
         piece = self.board[position]
-        row, col = position // 8, position % 8
 
         # Normal king moves (one square in any direction)
-        for row_offset in [-1, 0, 1]:
-            for col_offset in [-1, 0, 1]:
-                if row_offset == 0 and col_offset == 0:
-                    continue  # Skip the king's current position
+        for new_pos in iter_squares(self.tables.king_attacks[position]):
+            target = self.board[new_pos]
+
+            if target.piece_type == PieceType.EMPTY or target.color != piece.color:
+                yield new_pos
+
+        # Castling
+        if piece.color == Color.WHITE:
+            king_side = self.white_can_castle_king_side
+            queen_side = self.white_can_castle_queen_side
+            opponent = Color.BLACK
+        else:
+            king_side = self.black_can_castle_king_side
+            queen_side = self.black_can_castle_queen_side
+            opponent = Color.WHITE
+
+        if not (king_side or queen_side) or self._is_square_attacked(
+            position, opponent
+        ):
+            return
+
+        # The king may not pass through an attacked square, the destination
+        # itself is checked by the legal move filter
+        if king_side:
+            if (
+                self.board[position + 1].piece_type == PieceType.EMPTY
+                and self.board[position + 2].piece_type == PieceType.EMPTY
+                and not self._is_square_attacked(position + 1, opponent)
+            ):
+                yield position + 2
+
+        if queen_side:
+            if (
+                self.board[position - 1].piece_type == PieceType.EMPTY
+                and self.board[position - 2].piece_type == PieceType.EMPTY
+                and self.board[position - 3].piece_type == PieceType.EMPTY
+                and not self._is_square_attacked(position - 1, opponent)
+            ):
+                yield position - 2
+
+    def _iter_pseudo_legal_moves(self, position: int) -> Iterator[int]:
+        """Yield the destinations of the piece at position, ignoring checks"""
+        piece_type = self.board[position].piece_type
+        if piece_type == PieceType.PAWN:
+            return self._iter_pawn_moves(position)
+        elif piece_type == PieceType.KNIGHT:
+            return self._iter_knight_moves(position)
+        elif piece_type == PieceType.BISHOP:
+            return self._iter_bishop_moves(position)
+        elif piece_type == PieceType.ROOK:
+            return self._iter_rook_moves(position)
+        elif piece_type == PieceType.QUEEN:
+            return self._iter_queen_moves(position)
+        elif piece_type == PieceType.KING:
+            return self._iter_king_moves(position)
+        return iter(())
 
-                new_row, new_col = row + row_offset, col + col_offset
+    def _get_pawn_moves(self, position: int) -> list[int]:
+        return list(self._iter_pawn_moves(position))
 
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    new_pos = new_row * 8 + new_col
-                    target = self.board[new_pos]
+    def _get_knight_moves(self, position: int) -> list[int]:
+        return list(self._iter_knight_moves(position))
 
-                    if (
-                        target.piece_type == PieceType.EMPTY
-                        or target.color != piece.color
-                    ):
-                        moves.append(new_pos)
+    def _get_bishop_moves(self, position: int) -> list[int]:
+        return list(self._iter_bishop_moves(position))
 
-        # Castling
-        if not self.is_in_check(piece.color):
-            if piece.color == Color.WHITE:
-                # Kingside castling
-                if self.white_can_castle_king_side:
-                    if (
-                        self.board[position + 1].piece_type == PieceType.EMPTY
-                        and self.board[position + 2].piece_type == PieceType.EMPTY
-                        and not self._is_square_attacked(position + 1, Color.BLACK)
-                    ):
-                        print("White castling king side")
-                        moves.append(position + 2)
-
-                # Queenside castling
-                if self.white_can_castle_queen_side:
-                    if (
-                        self.board[position - 1].piece_type == PieceType.EMPTY
-                        and self.board[position - 2].piece_type == PieceType.EMPTY
-                        and self.board[position - 3].piece_type == PieceType.EMPTY
-                        and not self._is_square_attacked(position - 2, Color.BLACK)
-                    ):
-                        print("White castling queen side")
-                        moves.append(position - 2)
-            else:
-                # Kingside castling for black
-                if self.black_can_castle_king_side:
-                    if (
-                        self.board[position + 1].piece_type == PieceType.EMPTY
-                        and self.board[position + 2].piece_type == PieceType.EMPTY
-                        and not self._is_square_attacked(position + 2, Color.WHITE)
-                    ):
-                        print("Black castling king side")
-                        moves.append(position + 2)
-
-                # Queenside castling for black
-                if self.black_can_castle_queen_side:
-                    if (
-                        self.board[position - 1].piece_type == PieceType.EMPTY
-                        and self.board[position - 2].piece_type == PieceType.EMPTY
-                        and self.board[position - 3].piece_type == PieceType.EMPTY
-                        and not self._is_square_attacked(position - 2, Color.WHITE)
-                    ):
-                        print("Black castling queen side")
-                        moves.append(position - 2)
+    def _get_rook_moves(self, position: int) -> list[int]:
+        return list(self._iter_rook_moves(position))
 
-        return moves
+    def _get_queen_moves(self, position: int) -> list[int]:
+        return list(self._iter_queen_moves(position))
+
+    def _get_king_moves(self, position: int) -> list[int]:
+        return list(self._iter_king_moves(position))
 
     def _is_square_attacked(self, position: int, by_color: Color) -> bool:
-        """Check if a square is under attack by pieces of the given color"""
-        # Save the current piece at this position
-        original_piece = self.board[position]
-
-        # Place a temporary piece of the opposite color
-        temp_color = Color.BLACK if by_color == Color.WHITE else Color.WHITE
-        self.board[position] = Piece(
-            piece_type=PieceType.PAWN, board_index=position, color=temp_color
-        )
+        """Check if a square is under attack by pieces of the given color
+
+        Looks outward from the square and stops at the first attacker found.
+        """
+        board = self.board
+        tables = self.tables
+
+        # A pawn attacks this square if it stands where an opposite colored
+        # pawn on this square would capture
+        pawn_squares = tables.pawn_attacks_for(by_color == Color.BLACK, position)
+        for sq in iter_squares(pawn_squares):
+            p = board[sq]
+            if p.piece_type == PieceType.PAWN and p.color == by_color:
+                return True
+
+        for sq in iter_squares(tables.knight_attacks[position]):
+            p = board[sq]
+            if p.piece_type == PieceType.KNIGHT and p.color == by_color:
+                return True
+
+        for sq in iter_squares(tables.king_attacks[position]):
+            p = board[sq]
+            if p.piece_type == PieceType.KING and p.color == by_color:
+                return True
+
+        # Walk each ray until the first piece, which attacks if it slides that way
+        for direction_indexes, sliders in (
+            (ROOK_DIRECTION_INDEXES, (PieceType.ROOK, PieceType.QUEEN)),
+            (BISHOP_DIRECTION_INDEXES, (PieceType.BISHOP, PieceType.QUEEN)),
+        ):
+            for direction in direction_indexes:
+                for sq in tables.iter_ray(direction, position):
+                    p = board[sq]
+                    if p.piece_type != PieceType.EMPTY:
+                        if p.color == by_color and p.piece_type in sliders:
+                            return True
+                        break
 
-        # Check if any of the opponent's pieces can move to this square
-        for i, piece in enumerate(self.board):
-            if piece.color == by_color:
-                # Use appropriate move generation based on piece type
-                if piece.piece_type == PieceType.PAWN:
-                    # Special handling for pawns since they capture differently than they move
-                    row, col = i // 8, i % 8
-                    direction = 1 if by_color == Color.WHITE else -1
-
-                    for col_offset in [-1, 1]:
-                        new_col = col + col_offset
-                        new_row = row + direction
-
-                        if 0 <= new_row < 8 and 0 <= new_col < 8:
-                            new_pos = new_row * 8 + new_col
-                            if new_pos == position:
-                                # Restore the original piece and return True
-                                self.board[position] = original_piece
-                                return True
-                else:
-                    # For other pieces, use their normal move generation
-                    moves = []
-                    if piece.piece_type == PieceType.KNIGHT:
-                        moves = self._get_knight_moves(i)
-                    elif piece.piece_type == PieceType.BISHOP:
-                        moves = self._get_bishop_moves(i)
-                    elif piece.piece_type == PieceType.ROOK:
-                        moves = self._get_rook_moves(i)
-                    elif piece.piece_type == PieceType.QUEEN:
-                        moves = self._get_queen_moves(i)
-                    elif piece.piece_type == PieceType.KING:
-                        # For the king, we need basic moves without castling
-                        row, col = i // 8, i % 8
-                        for row_offset in [-1, 0, 1]:
-                            for col_offset in [-1, 0, 1]:
-                                if row_offset == 0 and col_offset == 0:
-                                    continue
-                                new_row, new_col = row + row_offset, col + col_offset
-                                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                                    moves.append(new_row * 8 + new_col)
-
-                    if position in moves:
-                        # Restore the original piece and return True
-                        self.board[position] = original_piece
-                        return True
-
-        # Restore the original piece
-        self.board[position] = original_piece
         return False
 
+    def _find_king(self, color: Color) -> int | None:
+        for i, p in enumerate(self.board):
+            if p.piece_type == PieceType.KING and p.color == color:
+                return i
+        return None
+
     def _is_king_in_check_after_move(self, from_pos: int, to_pos: int) -> bool:
         """Test if a move would leave or put the king in check"""
         # Save current board state
         original_to_piece = self.board[to_pos]
         original_from_piece = self.board[from_pos]
+        color = original_from_piece.color
+
+        # An en passant capture also removes the pawn beside the destination
+        captured_pos = None
+        if (
+            original_from_piece.piece_type == PieceType.PAWN
+            and original_to_piece.piece_type == PieceType.EMPTY
+            and (from_pos - to_pos) % 8 != 0
+        ):
+            captured_pos = to_pos + (8 if color == Color.WHITE else -8)
+            captured_piece = self.board[captured_pos]
+            self.board[captured_pos] = original_to_piece
 
         # Make the move temporarily
         self._move(from_pos, to_pos)
 
-        # Find the king of the current player
-        king_pos = None
-        for i, p in enumerate(self.board):
-            if p.piece_type == PieceType.KING and p.color == self.active_color:
-                king_pos = i
-                break
-
-        # If king not found, something went wrong
-        if king_pos is None:
-            # Restore the board
-            self.board[from_pos] = original_from_piece
-            self.board[to_pos] = original_to_piece
-            return True
-
-        # Check if the king is under attack
-        opponent_color = (
-            Color.BLACK if self.active_color == Color.WHITE else Color.WHITE
+        # Check if the king of the moving side is under attack
+        king_pos = self._find_king(color)
+        opponent_color = Color.BLACK if color == Color.WHITE else Color.WHITE
+        is_in_check = king_pos is None or self._is_square_attacked(
+            king_pos, opponent_color
         )
-        is_in_check = self._is_square_attacked(king_pos, opponent_color)
 
         # Restore the board
         self.board[from_pos] = original_from_piece
         self.board[to_pos] = original_to_piece
+        if captured_pos is not None:
+            self.board[captured_pos] = captured_piece
 
         return is_in_check
 
     def is_in_check(self, color: Color) -> bool:
         """Check if the given color's king is in check"""
-        # Find the king
-        king_pos = None
-        for i, p in enumerate(self.board):
-            if p.piece_type == PieceType.KING and p.color == color:
-                king_pos = i
-                break
-
+        king_pos = self._find_king(color)
         if king_pos is None:
             return False  # Should not happen in a valid game
 
@@ -351,26 +416,93 @@ class Engine(Board):
 
     def is_checkmate(self, color: Color) -> bool:
         """Check if the given color is in checkmate"""
-        # If not in check, it's not checkmate
-        if not self.is_in_check(color):
-            return False
+        # The side to move is answered from the cached status
+        if color == self.active_color:
+            return self.status() == GameStatus.CHECKMATE
 
-        # Check if any move can get out of check
-        saved_active_color = self.active_color
-        self.active_color = color  # Temporarily set active color to check moves
+        # In check and no move gets out of it
+        return self.is_in_check(color) and not self.has_legal_move(color)
 
+    def _has_insufficient_material(self) -> bool:
+        """Check if neither side has enough material left to deliver mate"""
+        minors = []
         for i, p in enumerate(self.board):
-            if p.color == color:
-                legal_moves = self.get_legal_moves(i)
-                if legal_moves:
-                    self.active_color = saved_active_color
-                    return False
+            if p.piece_type in (PieceType.EMPTY, PieceType.KING):
+                continue
+            if p.piece_type not in (PieceType.KNIGHT, PieceType.BISHOP):
+                return False
+            minors.append((i, p))
+
+        # King against king, or king and a single minor piece
+        if len(minors) <= 1:
+            return True
 
-        # Restore active color
-        self.active_color = saved_active_color
+        # Only bishops, all standing on the same square color
+        if all(p.piece_type == PieceType.BISHOP for _, p in minors):
+            square_colors = {(i // 8 + i % 8) % 2 for i, _ in minors}
+            return len(square_colors) == 1
 
-        # No legal moves and in check = checkmate
-        return True
+        return False
+
+    def _compute_status(self) -> GameStatus:
+        if not self.legal_move_map():
+            if self.is_in_check(self.active_color):
+                return GameStatus.CHECKMATE
+            return GameStatus.STALEMATE
+
+        if self.half_move >= 100:
+            return GameStatus.DRAW_FIFTY_MOVES
+        if self._position_counts.get(self._get_position_key(), 0) >= 3:
+            return GameStatus.DRAW_THREEFOLD_REPETITION
+        if self._has_insufficient_material():
+            return GameStatus.DRAW_INSUFFICIENT_MATERIAL
+
+        return GameStatus.ONGOING
+
+    def status(self) -> GameStatus:
+        """
+        Returns the state of the game for the side to move
+
+        The result is computed once per position and reused until the move
+        counter changes, so it is cheap to poll every frame.
+
+        Returns:
+            GameStatus: Ongoing, checkmate, stalemate or the reason for a draw
+        """
+        if self._status_cache is None or self._status_cache[0] != self.move_counter:
+            self._status_cache = (self.move_counter, self._compute_status())
+        return self._status_cache[1]
+
+    def legal_move_map(self) -> LegalMoveMap:
+        """
+        Returns every legal move of the side to move, grouped by starting square
+
+        The map is computed once per position and reused until the next
+        make_move or load_fen_notation. It is shared between callers and must
+        not be modified.
+
+        Returns:
+            dict[int, list[int]]: Starting index -> legal destination indices,
+                only squares with at least one legal move are present
+        """
+        cache = self._legal_move_map_cache
+        if (
+            cache is not None
+            and cache[0] == self.move_counter
+            and cache[1] == self.active_color
+        ):
+            return cache[2]
+
+        move_map = {}
+        context = self._legality_context()
+        for i, p in enumerate(self.board):
+            if p.color == self.active_color:
+                moves = list(self._iter_legal_moves_from(i, context))
+                if moves:
+                    move_map[i] = moves
+
+        self._legal_move_map_cache = (self.move_counter, self.active_color, move_map)
+        return move_map
 
     def get_legal_moves(self, position: int) -> list[int]:
         """
@@ -388,36 +520,120 @@ class Engine(Board):
         if piece.piece_type == PieceType.EMPTY or piece.color != self.active_color:
             return []
 
-        # Get basic moves for the piece
-        if piece.piece_type == PieceType.PAWN:
-            moves = self._get_pawn_moves(position)
-        elif piece.piece_type == PieceType.KNIGHT:
-            moves = self._get_knight_moves(position)
-        elif piece.piece_type == PieceType.BISHOP:
-            moves = self._get_bishop_moves(position)
-        elif piece.piece_type == PieceType.ROOK:
-            moves = self._get_rook_moves(position)
-        elif piece.piece_type == PieceType.QUEEN:
-            moves = self._get_queen_moves(position)
-        elif piece.piece_type == PieceType.KING:
-            moves = self._get_king_moves(position)
-        else:
-            return []
+        return list(self.legal_move_map().get(position, []))
+
+    def _legality_context(self) -> tuple[bool, int]:
+        """
+        What the side to move needs to know to skip legality tests
+
+        Returns:
+            tuple[bool, int]: Whether it is in check, and a mask of every
+                square on a line with its king
+        """
+        king_pos = self._find_king(self.active_color)
+        if king_pos is None:
+            return True, 0
+        opponent = Color.BLACK if self.active_color == Color.WHITE else Color.WHITE
+        king_lines = 0
+        for direction in QUEEN_DIRECTION_INDEXES:
+            king_lines |= self.tables.ray(direction, king_pos)
+        return self._is_square_attacked(king_pos, opponent), king_lines
+
+    def _iter_legal_moves_from(
+        self, position: int, context: tuple[bool, int] | None = None
+    ) -> Iterator[int]:
+        """Yield the legal destinations of a single piece, bypassing the cache"""
+        piece = self.board[position]
+
+        # If there's no piece or it's not this player's turn, yield nothing
+        if piece.piece_type == PieceType.EMPTY or piece.color != self.active_color:
+            return
+
+        in_check, king_lines = context or self._legality_context()
+
+        # Out of check, a piece off every line through its king cannot be
+        # pinned, so only king moves and en passant still need testing
+        if not in_check and not (king_lines >> position) & 1:
+            ep_pos = (
+                self._get_index_from_pgn(self.en_passant_target)
+                if self.en_passant_target is not None
+                and piece.piece_type == PieceType.PAWN
+                else None
+            )
+            for move in self._iter_pseudo_legal_moves(position):
+                if (
+                    piece.piece_type != PieceType.KING and move != ep_pos
+                ) or not self._is_king_in_check_after_move(position, move):
+                    yield move
+            return
 
         # Filter out moves that would leave the king in check
-        return [
-            move
-            for move in moves
-            if not self._is_king_in_check_after_move(position, move)
-        ]
+        for move in self._iter_pseudo_legal_moves(position):
+            if not self._is_king_in_check_after_move(position, move):
+                yield move
+
+    def _generate_legal_moves(self, position: int) -> list[int]:
+        """Generate the legal moves of a single piece, bypassing the cache"""
+        return list(self._iter_legal_moves_from(position))
+
+    def iter_legal_moves(self) -> Iterator[tuple[int, int]]:
+        """
+        Lazily yield the legal moves of the side to move
+
+        Consumers that stop early only pay for the moves they looked at. When
+        the legal move map of this position is already cached it is used
+        instead.
 
-    def make_move(self, from_pos: int, to_pos: int) -> bool:
+        Returns:
+            Iterator[tuple[int, int]]: (from, to) index pairs
+        """
+        cache = self._legal_move_map_cache
+        if (
+            cache is not None
+            and cache[0] == self.move_counter
+            and cache[1] == self.active_color
+        ):
+            for from_pos, moves in cache[2].items():
+                for to_pos in moves:
+                    yield from_pos, to_pos
+            return
+
+        context = self._legality_context()
+        for i, p in enumerate(self.board):
+            if p.color == self.active_color:
+                for to_pos in self._iter_legal_moves_from(i, context):
+                    yield i, to_pos
+
+    def has_legal_move(self, color: Color | None = None) -> bool:
+        """
+        Check if a side has at least one legal move, stopping at the first one
+
+        Args:
+            color (Color | None): The side to test, defaults to the side to move
+
+        Returns:
+            bool: True if the side can move
+        """
+        if color is None or color == self.active_color:
+            return next(self.iter_legal_moves(), None) is not None
+
+        saved_active_color = self.active_color
+        self.active_color = color  # Temporarily set active color to check moves
+        try:
+            return next(self.iter_legal_moves(), None) is not None
+        finally:
+            self.active_color = saved_active_color
+
+    def make_move(
+        self, from_pos: int, to_pos: int, promotion: PieceType = PieceType.QUEEN
+    ) -> bool:
         """
         Make a move if it's legal and update the board state
 
         Args:
             from_pos (int): Starting position index
             to_pos (int): Destination position index
+            promotion (PieceType): Piece a pawn reaching the last rank becomes
 
         Returns:
             bool: True if move was made, False if illegal
@@ -427,11 +643,27 @@ class Engine(Board):
         if piece.piece_type == PieceType.EMPTY or piece.color != self.active_color:
             return False
 
-        # Get legal moves and check if destination is legal
-        legal_moves = self.get_legal_moves(from_pos)
+        # Check the destination against the cached legal moves of this position
+        legal_moves = self.legal_move_map().get(from_pos, [])
         if to_pos not in legal_moves:
             return False
 
+        # Everything undo_move needs to put the position back
+        self._history.append(
+            (
+                list(self.board),
+                self.active_color,
+                self.white_can_castle_king_side,
+                self.white_can_castle_queen_side,
+                self.black_can_castle_king_side,
+                self.black_can_castle_queen_side,
+                self.en_passant_target,
+                self.half_move,
+                self.full_move,
+                self._current_caches(),
+            )
+        )
+
         # Special handling for castling
         if piece.piece_type == PieceType.KING and abs(from_pos - to_pos) == 2:
             # Kingside castling
@@ -466,14 +698,17 @@ class Engine(Board):
         # Make the move
         self._move(from_pos, to_pos)
 
-        # Handle pawn promotion (in a real game you would prompt for piece type)
+        # Handle pawn promotion
         if piece.piece_type == PieceType.PAWN:
             # Check if pawn reached the last rank
-            if (piece.color == Color.WHITE and to_pos // 8 == 7) or (
-                piece.color == Color.BLACK and to_pos // 8 == 0
+            if (piece.color == Color.WHITE and to_pos // 8 == 0) or (
+                piece.color == Color.BLACK and to_pos // 8 == 7
             ):
-                # Auto-promote to queen for this demo
-                self.board[to_pos].piece_type = PieceType.QUEEN
+                if promotion not in PROMOTION_PIECES:
+                    promotion = PieceType.QUEEN
+                self.board[to_pos] = Piece(
+                    piece_type=promotion, board_index=to_pos, color=piece.color
+                )
 
         # Update castling rights if king or rook moved
         if piece.piece_type == PieceType.KING:
@@ -484,15 +719,15 @@ class Engine(Board):
                 self.black_can_castle_king_side = False
                 self.black_can_castle_queen_side = False
 
-        elif piece.piece_type == PieceType.ROOK:
-            # Update based on which rook moved
-            if from_pos == 7:  # h1
+        # A rook leaving or captured on its starting square loses its side
+        for square in (from_pos, to_pos):
+            if square == 63:  # h1
                 self.white_can_castle_king_side = False
-            elif from_pos == 0:  # a1
+            elif square == 56:  # a1
                 self.white_can_castle_queen_side = False
-            elif from_pos == 63:  # h8
+            elif square == 7:  # h8
                 self.black_can_castle_king_side = False
-            elif from_pos == 56:  # a8
+            elif square == 0:  # a8
                 self.black_can_castle_queen_side = False
 
         # Update en passant target
@@ -518,4 +753,310 @@ class Engine(Board):
             Color.BLACK if self.active_color == Color.WHITE else Color.WHITE
         )
 
+        # Record the new position for repetition detection
+        key = self._get_position_key()
+        self._position_counts[key] = self._position_counts.get(key, 0) + 1
+        self.move_counter += 1
+
         return True
+
+    def undo_move(self) -> bool:
+        """
+        Take back the last move made with make_move
+
+        Returns:
+            bool: True if a move was taken back, False if there was none
+        """
+        if not self._history:
+            return False
+
+        key = self._get_position_key()
+        self._position_counts[key] -= 1
+        if not self._position_counts[key]:
+            del self._position_counts[key]
+
+        (
+            self.board,
+            self.active_color,
+            self.white_can_castle_king_side,
+            self.white_can_castle_queen_side,
+            self.black_can_castle_king_side,
+            self.black_can_castle_queen_side,
+            self.en_passant_target,
+            self.half_move,
+            self.full_move,
+            caches,
+        ) = self._history.pop()
+
+        # The counter only grows so caches of the undone position never match,
+        # the caches of the restored position are valid again under the new one
+        self.move_counter += 1
+        move_map, index, status = caches
+        if move_map is not None:
+            self._legal_move_map_cache = (self.move_counter, *move_map)
+        if index is not None:
+            self._legal_move_index_cache = (self.move_counter, *index)
+        if status is not None:
+            self._status_cache = (self.move_counter, status)
+        return True
+
+    def clear_history(self) -> None:
+        """
+        Forget the saved states of the moves made so far
+
+        The moves can no longer be taken back, the repetition counts are kept.
+        For callers that replay long games without ever undoing a move.
+        """
+        self._history.clear()
+
+    def _current_caches(self) -> tuple:
+        """The caches computed for this position, without their move counter"""
+        counter = self.move_counter
+        move_map = self._legal_move_map_cache
+        index = self._legal_move_index_cache
+        status = self._status_cache
+        return (
+            move_map[1:] if move_map is not None and move_map[0] == counter else None,
+            index[1:] if index is not None and index[0] == counter else None,
+            status[1] if status is not None and status[0] == counter else None,
+        )
+
+    def legal_moves(self) -> list[Move]:
+        """
+        Every legal move of the side to move, one per promotion piece
+
+        Returns:
+            list[Move]: From index, to index and promotion piece
+        """
+        moves = []
+        for from_pos, destinations in self.legal_move_map().items():
+            for to_pos in destinations:
+                if self._is_promotion(from_pos, to_pos):
+                    moves.extend((from_pos, to_pos, p) for p in PROMOTION_PIECES)
+                else:
+                    moves.append((from_pos, to_pos, PieceType.QUEEN))
+        return moves
+
+    def perft(self, depth: int, stop: threading.Event | None = None) -> int:
+        """
+        Count the leaf nodes of the legal move tree, to check move generation
+
+        Args:
+            depth (int): Plies to search
+            stop (threading.Event | None): Once set, the count gives up and
+                returns what it has counted so far
+
+        Returns:
+            int: Number of move sequences of exactly that length, less if
+                stopped
+        """
+        if depth <= 0:
+            return 1
+        moves = self.legal_moves()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            if stop is not None and stop.is_set():
+                break
+            self.make_move(*move)
+            try:
+                nodes += self.perft(depth - 1, stop)
+            finally:
+                self.undo_move()
+        return nodes
+
+    def _legal_move_index(self) -> dict[tuple[PieceType, int], list[int]]:
+        """(piece type, destination) -> starting squares, from the legal move map"""
+        cache = self._legal_move_index_cache
+        if (
+            cache is not None
+            and cache[0] == self.move_counter
+            and cache[1] == self.active_color
+        ):
+            return cache[2]
+
+        index: dict[tuple[PieceType, int], list[int]] = {}
+        for from_pos, moves in self.legal_move_map().items():
+            piece_type = self.board[from_pos].piece_type
+            for to_pos in moves:
+                index.setdefault((piece_type, to_pos), []).append(from_pos)
+
+        self._legal_move_index_cache = (self.move_counter, self.active_color, index)
+        return index
+
+    def _is_promotion(self, from_pos: int, to_pos: int) -> bool:
+        piece_type = self.board[from_pos].piece_type
+        return piece_type == PieceType.PAWN and to_pos // 8 in (0, 7)
+
+    def move_to_san(
+        self, from_pos: int, to_pos: int, promotion: PieceType = PieceType.QUEEN
+    ) -> str:
+        """
+        Get the standard algebraic notation of a legal move
+
+        Disambiguation comes from the cached legal moves of the position, only
+        the check suffix needs the move to be played.
+
+        Args:
+            from_pos (int): Starting position index
+            to_pos (int): Destination position index
+            promotion (PieceType): Piece a promoting pawn becomes
+
+        Raises:
+            ValueError: If the move is not legal
+
+        Returns:
+            str: The move, for example "Nbd7", "exd8=Q+" or "O-O"
+        """
+        if to_pos not in self.legal_move_map().get(from_pos, []):
+            raise ValueError(
+                f"Illegal move {self._get_pgn_from_index(from_pos)}"
+                f"{self._get_pgn_from_index(to_pos)}"
+            )
+
+        piece = self.board[from_pos]
+        to_square = self._get_pgn_from_index(to_pos)
+        is_capture = self.board[to_pos].piece_type != PieceType.EMPTY
+
+        if piece.piece_type == PieceType.KING and abs(from_pos - to_pos) == 2:
+            san = "O-O" if to_pos > from_pos else "O-O-O"
+        elif piece.piece_type == PieceType.PAWN:
+            # Pawns moving diagonally capture, en passant included
+            san = ""
+            if from_pos % 8 != to_pos % 8:
+                san = f"{self._get_pgn_from_index(from_pos)[0]}x"
+            san += to_square
+            if self._is_promotion(from_pos, to_pos):
+                if promotion not in PROMOTION_PIECES:
+                    promotion = PieceType.QUEEN
+                san += f"={promotion.value.upper()}"
+        else:
+            san = piece.piece_type.value.upper()
+            from_square = self._get_pgn_from_index(from_pos)
+            others = [
+                self._get_pgn_from_index(other)
+                for other in self._legal_move_index()[(piece.piece_type, to_pos)]
+                if other != from_pos
+            ]
+            if others:
+                if all(other[0] != from_square[0] for other in others):
+                    san += from_square[0]
+                elif all(other[1] != from_square[1] for other in others):
+                    san += from_square[1]
+                else:
+                    san += from_square
+            if is_capture:
+                san += "x"
+            san += to_square
+
+        # Mate only needs to know that no reply exists, not every reply
+        self.make_move(from_pos, to_pos, promotion)
+        if self.is_in_check(self.active_color):
+            san += "+" if self.has_legal_move() else "#"
+        self.undo_move()
+        return san
+
+    def san_to_move(self, san: str) -> Move:
+        """
+        Find the legal move described by a SAN string
+
+        Args:
+            san (str): A move such as "Nbd7", "exd8=Q+" or "O-O"
+
+        Raises:
+            ValueError: If the move is malformed, illegal or ambiguous
+
+        Returns:
+            Move: From index, to index and promotion piece
+        """
+        text = san.rstrip("+#!?")
+
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            king_pos = self._find_king(self.active_color)
+            if king_pos is None:
+                raise ValueError(f"Illegal move {san}")
+            to_pos = king_pos + (2 if text in ("O-O", "0-0") else -2)
+            if to_pos not in self.legal_move_map().get(king_pos, []):
+                raise ValueError(f"Illegal move {san}")
+            return king_pos, to_pos, PieceType.QUEEN
+
+        match = SAN_RE.match(text)
+        if match is None:
+            raise ValueError(f"Invalid SAN {san}")
+
+        piece_type = (
+            PieceType(match["piece"].lower()) if match["piece"] else PieceType.PAWN
+        )
+        to_pos = self._get_index_from_pgn(match["to"])
+        candidates = [
+            from_pos
+            for from_pos in self._legal_move_index().get((piece_type, to_pos), [])
+            if (
+                not match["from_file"]
+                or self._get_pgn_from_index(from_pos)[0] == match["from_file"]
+            )
+            and (
+                not match["from_rank"]
+                or self._get_pgn_from_index(from_pos)[1] == match["from_rank"]
+            )
+        ]
+
+        if not candidates:
+            raise ValueError(f"Illegal move {san}")
+        if len(candidates) > 1:
+            raise ValueError(f"Ambiguous move {san}")
+
+        promotion = PieceType.QUEEN
+        if match["promotion"]:
+            promotion = PieceType(match["promotion"].lower())
+        return candidates[0], to_pos, promotion
+
+    def move_to_uci(
+        self, from_pos: int, to_pos: int, promotion: PieceType = PieceType.QUEEN
+    ) -> str:
+        """
+        Get the UCI notation of a move, for example "e2e4" or "e7e8q"
+
+        Args:
+            from_pos (int): Starting position index
+            to_pos (int): Destination position index
+            promotion (PieceType): Piece a promoting pawn becomes
+
+        Returns:
+            str: The move in UCI notation
+        """
+        uci = self._get_pgn_from_index(from_pos) + self._get_pgn_from_index(to_pos)
+        if self._is_promotion(from_pos, to_pos):
+            if promotion not in PROMOTION_PIECES:
+                promotion = PieceType.QUEEN
+            uci += promotion.value
+        return uci
+
+    def uci_to_move(self, uci: str) -> Move:
+        """
+        Find the legal move described by a UCI string
+
+        Args:
+            uci (str): A move such as "e2e4", "e1g1" or "e7e8q"
+
+        Raises:
+            ValueError: If the move is malformed or illegal
+
+        Returns:
+            Move: From index, to index and promotion piece
+        """
+        match = UCI_RE.match(uci.strip())
+        if match is None:
+            raise ValueError(f"Invalid UCI move {uci}")
+
+        from_pos = self._get_index_from_pgn(match["from"])
+        to_pos = self._get_index_from_pgn(match["to"])
+        if to_pos not in self.legal_move_map().get(from_pos, []):
+            raise ValueError(f"Illegal move {uci}")
+
+        promotion = PieceType.QUEEN
+        if match["promotion"]:
+            promotion = PieceType(match["promotion"])
+        return from_pos, to_pos, promotion
@@ -0,0 +1,154 @@
+import os
+import queue
+import re
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from engine import Engine
+
+PLACEMENT_RE = re.compile(r"[pnbrqkPNBRQK1-8]+")
+EN_PASSANT_RE = re.compile(r"[a-h][36]")
+
+# Castling right -> square of the king and of the rook, a8 is index 0
+CASTLING_SQUARES = {"K": (60, 63), "Q": (60, 56), "k": (4, 7), "q": (4, 0)}
+
+
+def validate_fen(fen: str) -> None:
+    """
+    Check that a FEN describes a position the engine can play from
+
+    Board.load_fen_notation trusts its input, a short rank or a castling
+    right without its rook would only fail later, deep in move generation.
+
+    Args:
+        fen (str): The FEN to check
+
+    Raises:
+        ValueError: If a field is malformed or contradicts the placement
+    """
+    fields = fen.split()
+    if len(fields) != 6:
+        raise ValueError("A FEN has 6 fields")
+    placement, active_color, castling, en_passant, halfmove, fullmove = fields
+
+    ranks = placement.split("/")
+    if len(ranks) != 8:
+        raise ValueError("The placement must have 8 ranks")
+    board = []
+    for rank in ranks:
+        if not PLACEMENT_RE.fullmatch(rank):
+            raise ValueError(f"Invalid rank {rank}")
+        for char in rank:
+            board.extend("." * int(char) if char.isdigit() else char)
+        if len(board) % 8:
+            raise ValueError(f"Rank {rank} does not have 8 squares")
+    if len(board) != 64:
+        raise ValueError("Every rank must have 8 squares")
+    if board.count("K") != 1 or board.count("k") != 1:
+        raise ValueError("Each side must have exactly one king")
+    if any(square in "Pp" for square in board[:8] + board[56:]):
+        raise ValueError("Pawns cannot stand on the first or last rank")
+
+    if active_color not in ("w", "b"):
+        raise ValueError(f"Side to move must be w or b, not {active_color}")
+
+    if castling != "-":
+        if len(set(castling)) != len(castling) or not set(castling) <= set("KQkq"):
+            raise ValueError(f"Invalid castling rights {castling}")
+        for right in castling:
+            king, rook = CASTLING_SQUARES[right]
+            pieces = "KR" if right.isupper() else "kr"
+            if board[king] + board[rook] != pieces:
+                raise ValueError(f"Castling right {right} without its king and rook")
+
+    # The pawn that just moved two squares belongs to the other side
+    ep_rank = "6" if active_color == "w" else "3"
+    if en_passant != "-" and (
+        not EN_PASSANT_RE.fullmatch(en_passant) or en_passant[1] != ep_rank
+    ):
+        raise ValueError(f"Invalid en passant square {en_passant}")
+
+    if not halfmove.isdigit() or not fullmove.isdigit() or int(fullmove) < 1:
+        raise ValueError("Invalid move counters")
+
+
+class EnginePool:
+    """
+    Engines handed out to one caller at a time
+
+    An engine is mutable, so concurrent requests must never share one. Every
+    checkout loads the position asked for, whatever the engine did before, so
+    nothing leaks from one request to the next. Idle engines are kept for
+    reuse, new ones are created when all are busy.
+
+    The pool belongs to the process that created it: after a fork the child
+    starts with a fresh, empty pool. Multi-process servers therefore scale
+    across cores without any locking between workers.
+    """
+
+    def __init__(self, max_idle: int | None = None):
+        self.max_idle = max_idle or 4 * (os.cpu_count() or 1)
+        self._lock = threading.Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        # Most recently returned first, its caches are the most likely warm
+        self._idle: queue.LifoQueue[Engine] = queue.LifoQueue()
+        self.created = 0
+        self.positions_loaded = 0
+
+    def _acquire(self) -> Engine:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.created += 1
+            return Engine()
+
+    def _release(self, engine: Engine) -> None:
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(engine)
+
+    def load(self, engine: Engine, fen: str | None = None) -> None:
+        """
+        Load a position into a checked out engine
+
+        Args:
+            engine (Engine): An engine of this pool
+            fen (str | None): Position to load, the starting position if None
+
+        Raises:
+            ValueError: If the FEN is not a string or is invalid
+        """
+        if fen is not None and not isinstance(fen, str):
+            raise ValueError("FEN must be a string")
+        if fen:
+            validate_fen(fen)
+            engine.load_fen_notation(fen)
+        else:
+            engine.load_fen_notation()
+        with self._lock:
+            self.positions_loaded += 1
+
+    @contextmanager
+    def engine(self, fen: str | None = None) -> Iterator[Engine]:
+        """
+        Check an engine out for the duration of a with block
+
+        Args:
+            fen (str | None): Position to load, the starting position if None
+
+        Raises:
+            ValueError: If the FEN is invalid, the engine is returned first
+
+        Returns:
+            Iterator[Engine]: An engine no other caller is using
+        """
+        engine = self._acquire()
+        try:
+            self.load(engine, fen)
+            yield engine
+        finally:
+            self._release(engine)
@@ -0,0 +1,344 @@
+import argparse
+import json
+import multiprocessing
+import re
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+from engine import Engine
+from search import SearchLimits, SearchResult, Searcher
+
+# An operation: opcode followed by operands up to the next unquoted semicolon
+OPERATION_RE = re.compile(r'\s*([A-Za-z]\w*)((?:\s+(?:"[^"]*"|[^\s;"]+))*)\s*;?')
+OPERAND_RE = re.compile(r'"([^"]*)"|([^\s;"]+)')
+
+
+class EpdPosition:
+    """A test position: the FEN fields and the EPD operations that follow them
+
+    A record that could not be parsed keeps its text as fen and the reason in
+    error, so the run reports it instead of stopping.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        fen: str,
+        operations: dict[str, list[str]],
+        error: str | None = None,
+    ):
+        self.index = index
+        self.fen = fen
+        self.operations = operations
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"EpdPosition({self.index}, {self.id!r})"
+
+    @property
+    def id(self) -> str:
+        return " ".join(self.operations.get("id", [])) or str(self.index)
+
+    @property
+    def best_moves(self) -> list[str]:
+        return self.operations.get("bm", [])
+
+    @property
+    def avoid_moves(self) -> list[str]:
+        return self.operations.get("am", [])
+
+
+def parse_epd(line: str, index: int = 0) -> EpdPosition:
+    """
+    Parse one EPD record
+
+    The four position fields become a FEN with the move counters from the hmvc
+    and fmvn operations when present.
+
+    Args:
+        line (str): The record
+        index (int): Its position in the file
+
+    Raises:
+        ValueError: If the record has fewer than four fields
+
+    Returns:
+        EpdPosition: The parsed position
+    """
+    fields = line.strip().split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD record {line.strip()}")
+
+    operations: dict[str, list[str]] = {}
+    rest = fields[4] if len(fields) > 4 else ""
+    for match in OPERATION_RE.finditer(rest):
+        if not match.group(0).strip():
+            continue
+        operands = [a or b for a, b in OPERAND_RE.findall(match.group(2))]
+        operations[match.group(1)] = operands
+
+    half_move = operations.get("hmvc", ["0"])[0]
+    full_move = operations.get("fmvn", ["1"])[0]
+    fen = " ".join(fields[:4] + [half_move, full_move])
+    return EpdPosition(index, fen, operations)
+
+
+def read_epd(source: str | Path | TextIO) -> Iterator[EpdPosition]:
+    """
+    Lazily read the positions of an EPD file, skipping blank and comment lines
+
+    A malformed record is yielded with its error set rather than raised, so one
+    bad line does not abort the whole suite.
+
+    Args:
+        source (str | Path | TextIO): A path or an open text file
+
+    Returns:
+        Iterator[EpdPosition]: The positions, in file order
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from read_epd(f)
+        return
+
+    index = 0
+    for line in source:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            position = parse_epd(line, index)
+        except ValueError as e:
+            position = EpdPosition(index, line.strip(), {}, str(e))
+        yield position
+        index += 1
+
+
+class EpdResult:
+    """Outcome of searching one test position"""
+
+    def __init__(
+        self,
+        index: int,
+        id: str,
+        move: str | None,
+        solved: bool,
+        solve_time_ms: int | None,
+        nodes: int,
+        time_ms: int,
+        depth: int,
+        error: str | None = None,
+    ):
+        self.index = index
+        self.id = id
+        self.move = move
+        self.solved = solved
+        self.solve_time_ms = solve_time_ms
+        self.nodes = nodes
+        self.time_ms = time_ms
+        self.depth = depth
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def _is_correct(san: str, position: EpdPosition) -> bool:
+    # Check suffixes are optional in test suites, compare without them
+    san = san.rstrip("+#")
+    if position.best_moves and san not in [m.rstrip("+#") for m in position.best_moves]:
+        return False
+    return san not in [m.rstrip("+#") for m in position.avoid_moves]
+
+
+def solve_position(
+    position: EpdPosition, limits: SearchLimits, engine: Engine | None = None
+) -> EpdResult:
+    """
+    Search a test position and check the move against its bm and am operations
+
+    The time to solution is when the search last switched to a correct move
+    and kept it until the end.
+
+    Args:
+        position (EpdPosition): The position to solve
+        limits (SearchLimits): Budget of the search
+        engine (Engine | None): Engine to reuse, a new one is created if None
+
+    Returns:
+        EpdResult: The move played, whether it is correct and the search cost
+    """
+    if position.error is not None:
+        return EpdResult(
+            position.index, position.id, None, False, None, 0, 0, 0, position.error
+        )
+
+    engine = engine or Engine()
+    try:
+        engine.load_fen_notation(position.fen)
+    except (ValueError, KeyError, IndexError):
+        error = f"Invalid FEN {position.fen}"
+        return EpdResult(position.index, position.id, None, False, None, 0, 0, 0, error)
+
+    solve_time_ms: int | None = None
+
+    def on_iteration(result: SearchResult) -> None:
+        nonlocal solve_time_ms
+        correct = result.best_move is not None and _is_correct(
+            engine.move_to_san(*result.best_move), position
+        )
+        if not correct:
+            solve_time_ms = None
+        elif solve_time_ms is None:
+            solve_time_ms = result.time_ms
+
+    result = Searcher(engine).search(limits, on_iteration)
+    if result.best_move is None:
+        return EpdResult(
+            position.index,
+            position.id,
+            None,
+            False,
+            None,
+            result.nodes,
+            result.time_ms,
+            0,
+            "No legal move",
+        )
+
+    san = engine.move_to_san(*result.best_move)
+    solved = _is_correct(san, position)
+    if solved and solve_time_ms is None:
+        solve_time_ms = result.time_ms
+    return EpdResult(
+        position.index,
+        position.id,
+        san,
+        solved,
+        solve_time_ms if solved else None,
+        result.nodes,
+        result.time_ms,
+        result.depth,
+    )
+
+
+# One engine per worker process, reused for every position it solves
+_worker_engine: Engine | None = None
+
+
+def _solve_in_worker(args: tuple[EpdPosition, SearchLimits]) -> EpdResult:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine()
+    return solve_position(*args, engine=_worker_engine)
+
+
+def solve_positions(
+    positions: Iterable[EpdPosition],
+    limits: SearchLimits,
+    processes: int | None = None,
+) -> Iterator[EpdResult]:
+    """
+    Solve positions across a pool of worker processes
+
+    Every position gets the same budget. Results come back in file order.
+
+    Args:
+        positions (Iterable[EpdPosition]): The positions, typically from read_epd
+        limits (SearchLimits): Budget of each search
+        processes (int | None): Worker count, defaults to the CPU count
+
+    Returns:
+        Iterator[EpdResult]: One result per position
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1:
+        engine = Engine()
+        for position in positions:
+            yield solve_position(position, limits, engine)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        # One position per task, searches are long enough to hide the overhead
+        tasks = ((position, limits) for position in positions)
+        yield from pool.imap(_solve_in_worker, tasks, 1)
+
+
+def summarize(results: list[EpdResult], wall_time_s: float) -> dict:
+    """
+    Aggregate figures of a run, for comparing runs over time
+
+    Args:
+        results (list[EpdResult]): Results of every position
+        wall_time_s (float): Duration of the whole run
+
+    Returns:
+        dict: Solve rate, solve times and search speed
+    """
+    solved = [r for r in results if r.solved]
+    nodes = sum(r.nodes for r in results)
+    search_ms = sum(r.time_ms for r in results)
+    solve_times = sorted(r.solve_time_ms for r in solved)
+    mean_solve_time = median_solve_time = None
+    if solve_times:
+        mean_solve_time = round(sum(solve_times) / len(solve_times), 1)
+        median_solve_time = solve_times[len(solve_times) // 2]
+    return {
+        "positions": len(results),
+        "solved": len(solved),
+        "solve_rate": len(solved) / len(results) if results else 0.0,
+        "errors": sum(r.error is not None for r in results),
+        "mean_solve_time_ms": mean_solve_time,
+        "median_solve_time_ms": median_solve_time,
+        "nodes": nodes,
+        "nps": nodes * 1000 // search_ms if search_ms else 0,
+        "wall_time_s": round(wall_time_s, 3),
+        "positions_per_s": round(len(results) / wall_time_s, 2) if wall_time_s else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Solve an EPD test suite")
+    parser.add_argument("path", type=Path, help="EPD file to solve")
+    parser.add_argument(
+        "--movetime", type=int, default=None, help="Milliseconds per position"
+    )
+    parser.add_argument("--nodes", type=int, default=None, help="Nodes per position")
+    parser.add_argument("--depth", type=int, default=None, help="Depth per position")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="JSON file, stdout if unset"
+    )
+    args = parser.parse_args()
+
+    # Without an explicit budget every position gets one second
+    movetime = args.movetime
+    if movetime is None and args.nodes is None and args.depth is None:
+        movetime = 1000
+    limits = SearchLimits(depth=args.depth, movetime_ms=movetime, nodes=args.nodes)
+
+    start = time.perf_counter()
+    results = list(solve_positions(read_epd(args.path), limits, args.processes))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "suite": str(args.path),
+        "timestamp": int(time.time()),
+        "limits": {"movetime_ms": movetime, "nodes": args.nodes, "depth": args.depth},
+        "processes": args.processes or multiprocessing.cpu_count(),
+        "summary": summarize(results, elapsed),
+        "results": [r.to_dict() for r in results],
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
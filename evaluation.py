@@ -0,0 +1,247 @@
+import json
+import os
+from pathlib import Path
+
+from board import Board
+from core import Color, PieceType
+from tables import (
+    BISHOP_DIRECTION_INDEXES,
+    ROOK_DIRECTION_INDEXES,
+    get_tables,
+)
+
+PIECE_ORDER = (
+    PieceType.PAWN,
+    PieceType.KNIGHT,
+    PieceType.BISHOP,
+    PieceType.ROOK,
+    PieceType.QUEEN,
+    PieceType.KING,
+)
+
+# Piece-square tables from white's point of view, in board order (a8 first).
+# Black pieces read them mirrored vertically, see mirror_square.
+DEFAULT_PST = {
+    PieceType.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    PieceType.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    PieceType.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    PieceType.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    PieceType.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    PieceType.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}  # fmt: skip
+
+DEFAULT_MATERIAL = {
+    PieceType.PAWN: 100,
+    PieceType.KNIGHT: 320,
+    PieceType.BISHOP: 330,
+    PieceType.ROOK: 500,
+    PieceType.QUEEN: 900,
+    PieceType.KING: 0,
+}
+
+# Centipawns per attacked square not occupied by an own piece
+DEFAULT_MOBILITY = 2
+
+
+# Tuned weights are read from this file at startup when it exists
+DEFAULT_PARAMS_PATH = Path(__file__).with_name("eval_params.json")
+
+
+def mirror_square(square: int) -> int:
+    """The same square seen from the other side of the board"""
+    return square ^ 56
+
+
+class EvalParams:
+    """Weights of the linear evaluation: material, piece-square and mobility"""
+
+    def __init__(
+        self,
+        material: dict[PieceType, int] | None = None,
+        pst: dict[PieceType, list[int]] | None = None,
+        mobility: int = DEFAULT_MOBILITY,
+    ):
+        self.material = dict(material or DEFAULT_MATERIAL)
+        self.pst = {p: list(values) for p, values in (pst or DEFAULT_PST).items()}
+        self.mobility = mobility
+
+    def to_dict(self) -> dict:
+        return {
+            "material": {p.value: value for p, value in self.material.items()},
+            "pst": {p.value: values for p, values in self.pst.items()},
+            "mobility": self.mobility,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EvalParams":
+        """
+        Build weights from to_dict output, missing entries keep their defaults
+
+        Raises:
+            ValueError: If a piece is unknown or a table is not 64 squares long
+        """
+        material = dict(DEFAULT_MATERIAL)
+        for piece, value in data.get("material", {}).items():
+            material[PieceType(piece)] = int(value)
+        pst = dict(DEFAULT_PST)
+        for piece, values in data.get("pst", {}).items():
+            if len(values) != 64:
+                raise ValueError(f"Piece-square table of {piece} is not 64 long")
+            pst[PieceType(piece)] = [int(v) for v in values]
+        return cls(material, pst, int(data.get("mobility", DEFAULT_MOBILITY)))
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "EvalParams":
+        """
+        Read weights written by save
+
+        Raises:
+            ValueError: If the file is not valid JSON or holds invalid weights
+        """
+        try:
+            data = json.loads(Path(path).read_text())
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid evaluation parameters in {path}: {e}")
+        return cls.from_dict(data)
+
+
+def attacked_squares(board: Board, color: Color) -> int:
+    """Bitboard of the squares attacked by one color"""
+    tables = get_tables()
+    attacks = 0
+    for i, p in enumerate(board.board):
+        if p.color != color:
+            continue
+        if p.piece_type == PieceType.PAWN:
+            attacks |= tables.pawn_attacks_for(color == Color.WHITE, i)
+        elif p.piece_type == PieceType.KNIGHT:
+            attacks |= tables.knight_attacks[i]
+        elif p.piece_type == PieceType.KING:
+            attacks |= tables.king_attacks[i]
+        else:
+            directions = ()
+            if p.piece_type in (PieceType.ROOK, PieceType.QUEEN):
+                directions += ROOK_DIRECTION_INDEXES
+            if p.piece_type in (PieceType.BISHOP, PieceType.QUEEN):
+                directions += BISHOP_DIRECTION_INDEXES
+            for direction in directions:
+                for sq in tables.iter_ray(direction, i):
+                    attacks |= 1 << sq
+                    if board.board[sq].piece_type != PieceType.EMPTY:
+                        break
+    return attacks
+
+
+def evaluate(board: Board, params: "EvalParams | None" = None) -> int:
+    """
+    Static evaluation of a position in centipawns, from white's point of view
+
+    Args:
+        board (Board): The position
+        params (EvalParams | None): Weights, defaults to get_params()
+
+    Returns:
+        int: Positive when white is better
+    """
+    params = params or get_params()
+    score = 0
+    own = {Color.WHITE: 0, Color.BLACK: 0}
+    for i, p in enumerate(board.board):
+        if p.piece_type == PieceType.EMPTY:
+            continue
+        own[p.color] |= 1 << i
+        if p.color == Color.WHITE:
+            score += params.material[p.piece_type] + params.pst[p.piece_type][i]
+        else:
+            score -= (
+                params.material[p.piece_type]
+                + params.pst[p.piece_type][mirror_square(i)]
+            )
+
+    if params.mobility:
+        white_mobility = (
+            attacked_squares(board, Color.WHITE) & ~own[Color.WHITE]
+        ).bit_count()
+        black_mobility = (
+            attacked_squares(board, Color.BLACK) & ~own[Color.BLACK]
+        ).bit_count()
+        score += params.mobility * (white_mobility - black_mobility)
+
+    return score
+
+
+_params: EvalParams | None = None
+
+
+def default_params_path() -> Path:
+    """Path of the tuned weights, CHESS_EVAL_PARAMS overrides the default"""
+    path = os.environ.get("CHESS_EVAL_PARAMS")
+    if path:
+        return Path(path)
+    return DEFAULT_PARAMS_PATH
+
+
+def get_params() -> EvalParams:
+    """Process-wide evaluation weights, tuned ones if a params file exists"""
+    global _params
+    if _params is None:
+        path = default_params_path()
+        _params = EvalParams.load(path) if path.exists() else EvalParams()
+    return _params
@@ -0,0 +1,405 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+from core import PieceType
+from engine import PROMOTION_PIECES, Engine, Move
+from pgn import PgnGame, read_games
+
+# Bump whenever the entry layout or the position hash changes
+INDEX_VERSION = 2
+INDEX_MAGIC = b"CHESSIDX"
+HEADER = struct.Struct("<8sIIQQ")  # magic, version, entry size, entries, games
+HEADER_SIZE = 64
+
+# One entry per position reached in a game, sorted by hash then game
+ENTRY_DTYPE = np.dtype(
+    [
+        ("hash", "<u8"),
+        ("game", "<u4"),
+        ("move", "<u2"),  # NO_MOVE when the game ended in this position
+        ("result", "i1"),  # 1 white won, 0 draw, -1 black won, UNKNOWN_RESULT
+        ("_pad", "u1"),
+    ]
+)
+NO_MOVE = 0xFFFF
+UNKNOWN_RESULT = 2
+GAME_RESULTS = {"1-0": 1, "1/2-1/2": 0, "0-1": -1}
+
+# New entries sorted in memory and written to a segment file, segments are
+# merged into the index once per build
+RUN_SIZE = 1 << 22
+MERGE_CHUNK = 1 << 20
+
+# Headers kept in the games file, the rest of a game is not needed to explore
+GAME_HEADERS = ("Event", "Site", "Date", "White", "Black", "Result")
+
+
+def encode_move(from_pos: int, to_pos: int, promotion: PieceType | None) -> int:
+    """Pack a move in 16 bits: from, to and the promotion piece if any"""
+    promotion_code = PROMOTION_PIECES.index(promotion) + 1 if promotion else 0
+    return from_pos | to_pos << 6 | promotion_code << 12
+
+
+def decode_move(code: int) -> Move:
+    promotion_code = (code >> 12) & 7
+    promotion = PROMOTION_PIECES[promotion_code - 1] if promotion_code else None
+    return code & 63, (code >> 6) & 63, promotion or PieceType.QUEEN
+
+
+def game_entries(game: PgnGame, engine: Engine | None = None) -> np.ndarray:
+    """
+    Replay a game and make one entry per position it went through
+
+    Positions after an illegal move are left out, the ones before are kept.
+    The game field is left at 0 for the caller to fill in.
+
+    Args:
+        game (PgnGame): The game to replay
+        engine (Engine | None): Engine to reuse, a new one is created if None
+
+    Returns:
+        np.ndarray: Entries of ENTRY_DTYPE, in game order
+    """
+    engine = engine or Engine()
+    hashes: list[int] = []
+    moves: list[int] = []
+    try:
+        if game.start_fen:
+            engine.load_fen_notation(game.start_fen)
+        else:
+            engine.load_fen_notation()
+        for san in game.moves:
+            from_pos, to_pos, promotion = engine.san_to_move(san)
+            if not engine._is_promotion(from_pos, to_pos):
+                promotion = None
+            hashes.append(engine.zobrist_hash())
+            moves.append(encode_move(from_pos, to_pos, promotion))
+            engine.make_move(from_pos, to_pos, promotion or PieceType.QUEEN)
+        hashes.append(engine.zobrist_hash())
+        moves.append(NO_MOVE)
+    except (ValueError, KeyError, IndexError):
+        pass
+
+    entries = np.zeros(len(hashes), dtype=ENTRY_DTYPE)
+    entries["hash"] = hashes
+    entries["move"] = moves
+    entries["result"] = GAME_RESULTS.get(game.result, UNKNOWN_RESULT)
+    return entries
+
+
+# One engine per worker process, reused for every game it replays
+_worker_engine: Engine | None = None
+
+
+def _entries_in_worker(game: PgnGame) -> np.ndarray:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine()
+    return game_entries(game, _worker_engine)
+
+
+def _iter_game_entries(
+    games: Iterable[PgnGame], processes: int, chunksize: int
+) -> Iterator[tuple[PgnGame, np.ndarray]]:
+    if processes == 1:
+        engine = Engine()
+        for game in games:
+            yield game, game_entries(game, engine)
+        return
+
+    games = iter(games)
+    batch_size = processes * chunksize * 4
+    with multiprocessing.Pool(processes) as pool:
+        while batch := list(itertools.islice(games, batch_size)):
+            yield from zip(batch, pool.imap(_entries_in_worker, batch, chunksize))
+
+
+def _read_header(path: Path) -> tuple[int, int]:
+    """Entry and game counts of an index file"""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    try:
+        magic, version, entry_size, entries, games = HEADER.unpack(header)
+    except struct.error:
+        raise ValueError(f"{path} is not a position index")
+    if magic != INDEX_MAGIC:
+        raise ValueError(f"{path} is not a position index")
+    if version != INDEX_VERSION or entry_size != ENTRY_DTYPE.itemsize:
+        raise ValueError(f"{path} has unsupported index version {version}")
+    return entries, games
+
+
+def _map_entries(path: Path, count: int) -> np.ndarray:
+    if count == 0:
+        return np.zeros(0, dtype=ENTRY_DTYPE)
+    return np.memmap(
+        path, dtype=ENTRY_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)
+    )
+
+
+def _count_upto(entries: np.ndarray, bound: tuple[int, int]) -> int:
+    """Number of leading entries whose (hash, game) key is at most bound"""
+    bound_hash, bound_game = np.uint64(bound[0]), np.uint32(bound[1])
+    lo = int(np.searchsorted(entries["hash"], bound_hash, side="left"))
+    hi = int(np.searchsorted(entries["hash"], bound_hash, side="right"))
+    return lo + int(np.searchsorted(entries["game"][lo:hi], bound_game, side="right"))
+
+
+def _merge_sorted(sources: list[np.ndarray], f) -> None:
+    """
+    Write the merge of entry arrays sorted by hash then game to a file
+
+    A single streaming pass, only a chunk of each source is in memory at a
+    time. Entries are ordered by (hash, game) across chunks, so the games of
+    a position stay in order even when they straddle a chunk boundary.
+    """
+    chunk = max(MERGE_CHUNK // max(len(sources), 1), 1024)
+    positions = [0] * len(sources)
+    while True:
+        heads = {
+            i: np.asarray(source[positions[i] : positions[i] + chunk])
+            for i, source in enumerate(sources)
+            if positions[i] < len(source)
+        }
+        if not heads:
+            return
+        # Everything up to the smallest of the last keys is final
+        bound = min(
+            (int(head["hash"][-1]), int(head["game"][-1])) for head in heads.values()
+        )
+        parts = []
+        for i, head in heads.items():
+            head = head[: _count_upto(head, bound)]
+            parts.append(head)
+            positions[i] += len(head)
+        merged = np.concatenate(parts)
+        # Stable, the positions of one game keep their order
+        merged[np.lexsort((merged["game"], merged["hash"]))].tofile(f)
+
+
+def _write_index(path: Path, sources: list[np.ndarray], game_count: int) -> str:
+    """Merge sorted entries into a new index file next to path, returning it"""
+    entry_count = sum(len(source) for source in sources)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            header = HEADER.pack(
+                INDEX_MAGIC,
+                INDEX_VERSION,
+                ENTRY_DTYPE.itemsize,
+                entry_count,
+                game_count,
+            )
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            _merge_sorted(sources, f)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path
+
+
+def _write_run(path: Path, run: list[np.ndarray]) -> str:
+    """Sort new entries and write them to a segment file next to the index"""
+    entries = np.concatenate(run)
+    entries = entries[np.argsort(entries["hash"], kind="stable")]
+    fd, run_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".run")
+    with os.fdopen(fd, "wb") as f:
+        entries.tofile(f)
+    return run_path
+
+
+def games_path(path: Path) -> Path:
+    """File listing the headers of every indexed game, one JSON line each"""
+    path = Path(path)
+    return path.with_name(path.name + ".games")
+
+
+def build_index(
+    path: Path,
+    games: Iterable[PgnGame],
+    processes: int | None = None,
+    chunksize: int = 64,
+) -> tuple[int, int]:
+    """
+    Add games to a position index, creating it if needed
+
+    New entries are sorted in runs of RUN_SIZE, each written to a segment
+    file, so memory stays bounded whatever the archive size. Once every game
+    is read, the existing index and the segments are merged in a single
+    pass, so an index can grow one collection at a time without being
+    rewritten once per run.
+
+    The new index and games file are written to temporary files and only
+    replace the old ones at the end, the games file first: a build that
+    fails leaves the index as it was, and game IDs (the line numbers of the
+    games file) always match the index.
+
+    Args:
+        path (Path): The index file
+        games (Iterable[PgnGame]): The games, typically from read_games
+        processes (int | None): Worker count, defaults to the CPU count
+        chunksize (int): Games sent to a worker at a time
+
+    Returns:
+        tuple[int, int]: Games and positions added
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    old_count, first_game = _read_header(path) if path.exists() else (0, 0)
+    game_id = first_game
+
+    run: list[np.ndarray] = []
+    run_size = 0
+    run_paths: list[str] = []
+    index_tmp = None
+    processes = processes or multiprocessing.cpu_count()
+    fd, games_tmp = tempfile.mkstemp(
+        dir=path.parent, prefix=games_path(path).name, suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as games_file:
+            # Games already indexed, not those of an earlier build that failed
+            if first_game:
+                with open(games_path(path), encoding="utf-8") as f:
+                    games_file.writelines(itertools.islice(f, first_game))
+            for game, entries in _iter_game_entries(games, processes, chunksize):
+                entries["game"] = game_id
+                headers = {
+                    k: game.headers[k] for k in GAME_HEADERS if k in game.headers
+                }
+                games_file.write(json.dumps({"id": game_id, "headers": headers}) + "\n")
+                game_id += 1
+                run.append(entries)
+                run_size += len(entries)
+                if run_size >= RUN_SIZE:
+                    run_paths.append(_write_run(path, run))
+                    run, run_size = [], 0
+            if run_size:
+                run_paths.append(_write_run(path, run))
+
+        runs = [np.memmap(p, dtype=ENTRY_DTYPE, mode="r") for p in run_paths]
+        added = sum(len(r) for r in runs)
+        index_tmp = _write_index(path, [_map_entries(path, old_count), *runs], game_id)
+        del runs
+        os.replace(games_tmp, games_path(path))
+        os.replace(index_tmp, path)
+    finally:
+        for leftover in (games_tmp, index_tmp, *run_paths):
+            if leftover is not None and os.path.exists(leftover):
+                os.unlink(leftover)
+
+    return game_id - first_game, added
+
+
+class MoveStats:
+    """How often a move was played from a position and how those games ended"""
+
+    def __init__(self, move: Move | None):
+        self.move = move
+        self.games = 0
+        self.white_wins = 0
+        self.draws = 0
+        self.black_wins = 0
+
+    def add(self, result: int) -> None:
+        self.games += 1
+        if result == 1:
+            self.white_wins += 1
+        elif result == 0:
+            self.draws += 1
+        elif result == -1:
+            self.black_wins += 1
+
+
+class PositionIndex:
+    """Read-only view of an index file, lookups are binary searches on the map"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entry_count, self.game_count = _read_header(self.path)
+        self.entries = _map_entries(self.path, self.entry_count)
+        self._hashes = self.entries["hash"]
+        self._game_offsets: list[int] | None = None
+
+    def __len__(self) -> int:
+        return self.entry_count
+
+    def find(self, position_hash: int) -> np.ndarray:
+        """Every entry of a position, in game order"""
+        key = np.uint64(position_hash)
+        start = int(np.searchsorted(self._hashes, key, side="left"))
+        stop = int(np.searchsorted(self._hashes, key, side="right"))
+        return np.asarray(self.entries[start:stop])
+
+    def move_stats(self, position_hash: int) -> tuple[list[int], list[MoveStats]]:
+        """
+        Games that reached a position and the moves played from it
+
+        Args:
+            position_hash (int): Engine.zobrist_hash() of the position
+
+        Returns:
+            tuple[list[int], list[MoveStats]]: Game IDs in index order, and one
+                entry per move, most played first. Games that ended in the
+                position are counted under a move of None.
+        """
+        entries = self.find(position_hash)
+        game_ids = list(dict.fromkeys(int(g) for g in entries["game"]))
+        stats: dict[int, MoveStats] = {}
+        for code, result in zip(entries["move"].tolist(), entries["result"].tolist()):
+            if code not in stats:
+                stats[code] = MoveStats(None if code == NO_MOVE else decode_move(code))
+            stats[code].add(result)
+        return game_ids, sorted(stats.values(), key=lambda s: -s.games)
+
+    def game_headers(self, game_id: int) -> dict[str, str]:
+        """Tag pairs kept for a game, read from the games file"""
+        if self._game_offsets is None:
+            self._game_offsets = []
+            with open(games_path(self.path), "rb") as f:
+                offset = 0
+                for line in f:
+                    self._game_offsets.append(offset)
+                    offset += len(line)
+        with open(games_path(self.path), "rb") as f:
+            f.seek(self._game_offsets[game_id])
+            return json.loads(f.readline())["headers"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Add the games of a PGN archive to a position index"
+    )
+    parser.add_argument("pgn", type=Path, help="PGN file to index")
+    parser.add_argument("index", type=Path, help="Index file, created if missing")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=64, help="Games per worker task"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games, positions = build_index(
+        args.index, read_games(args.pgn), args.processes, args.chunksize
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{games} games, {positions} positions added to {args.index} "
+        f"in {elapsed:.2f}s ({games / elapsed if elapsed else 0:.1f} games/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
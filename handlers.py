@@ -0,0 +1,744 @@
+"""
+Engine queries behind the HTTP API, independent of any web framework
+
+Every handler takes the request parameters as a dict and returns an HTTP
+status with a JSON-serializable payload. api.py (Flask) and asgi.py (asyncio)
+both serve them, the latter from worker processes, so handlers only rely on
+state local to their process: the engine pool and the result cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+from engine import UCI_RE, Color, Engine, GameStatus, Move
+from engine_pool import EnginePool
+from evaluation import evaluate
+from pgn import read_games
+from puzzles import DEFAULT_DEPTH, MAX_PUZZLE_DEPTH, Puzzle, summarize, validate_puzzles
+from search import (
+    MATE_SCORE,
+    SearchLimits,
+    SearchResult,
+    Searcher,
+    TranspositionTable,
+)
+
+try:
+    from explorer import PositionIndex
+except ImportError:  # numpy is an optional dependency
+    PositionIndex = None
+
+Handler = Callable[[dict], tuple[int, dict]]
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Largest number of moves validated by one request
+MAX_BATCH_MOVES = 2000
+
+# Position index built with explorer.py
+EXPLORER_INDEX_PATH = Path(
+    os.environ.get("CHESS_EXPLORER_INDEX", Path(__file__).with_name("explorer.idx"))
+)
+EXPLORER_MAX_GAMES = 100
+_position_index = None
+
+# One engine per request in flight: the position comes with every request and
+# is never shared between requests
+engines = EnginePool()
+
+
+class ResultCache:
+    """Least recently used results by key, each one valid for ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Results of positions already analysed, popular positions (openings, puzzle
+# starts) are computed only once
+results = ResultCache(
+    int(os.environ.get("CHESS_API_CACHE_SIZE", 10000)),
+    float(os.environ.get("CHESS_API_CACHE_TTL", 300)),
+)
+
+# Limits of a best move search
+MAX_ANALYSIS_DEPTH = 10
+MAX_ANALYSIS_MOVETIME_MS = 10000
+ANALYSIS_TABLE_MB = 1
+
+
+class Analysis:
+    """Deepest search of a position so far, with the table to continue it"""
+
+    def __init__(self):
+        self.table = TranspositionTable(ANALYSIS_TABLE_MB)
+        self.result: SearchResult | None = None
+        # One search of a position at a time, the table is not shared
+        self.lock = threading.Lock()
+
+
+# Searches by position, a deeper request resumes where the last one stopped
+analyses = ResultCache(
+    int(os.environ.get("CHESS_API_ANALYSIS_CACHE_SIZE", 128)),
+    float(os.environ.get("CHESS_API_ANALYSIS_CACHE_TTL", 3600)),
+)
+_analyses_lock = threading.Lock()
+
+
+def normalize_fen(fen: str | None) -> str:
+    """
+    One spelling per FEN, so equivalent requests share a cache entry
+
+    Raises:
+        ValueError: If the FEN is not a string
+    """
+    if not fen:
+        return START_FEN
+    if not isinstance(fen, str):
+        raise ValueError("FEN must be a string")
+    return " ".join(fen.split())
+
+
+def cached(kind: str, fen: str | None, compute: Callable[[Engine], dict]) -> dict:
+    """
+    Result of a query on a position, computed only on a cache miss
+
+    Args:
+        kind (str): The query type, part of the cache key
+        fen (str | None): The position, the starting position if None
+        compute (Callable[[Engine], dict]): Builds the result from an engine
+            holding the position
+
+    Raises:
+        ValueError: If the FEN is invalid, nothing is cached then
+
+    Returns:
+        dict: The result, shared with the cache so it must not be modified
+    """
+    key = (kind, normalize_fen(fen))
+    value = results.get(key)
+    if value is None:
+        with engines.engine(key[1]) as engine:
+            value = compute(engine)
+        results.put(key, value)
+    return value
+
+
+def encode(payload: dict) -> tuple[bytes, str]:
+    """Canonical JSON body of a payload and its strong ETag value"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def get_position_index():
+    """Open the position index, reopening it when explorer.py appended to it"""
+    global _position_index
+    if PositionIndex is None or not EXPLORER_INDEX_PATH.exists():
+        return None
+    mtime = EXPLORER_INDEX_PATH.stat().st_mtime_ns
+    if _position_index is None or _position_index[0] != mtime:
+        _position_index = (mtime, PositionIndex(EXPLORER_INDEX_PATH))
+    return _position_index[1]
+
+
+def parse_square(square) -> int:
+    """Board index of a square name such as "e4"
+
+    Raises:
+        ValueError: If the name is not a square
+    """
+    if (
+        not isinstance(square, str)
+        or len(square) != 2
+        or square[0] not in "abcdefgh"
+        or square[1] not in "12345678"
+    ):
+        raise ValueError(f"Invalid square {square}")
+    return (8 - int(square[1])) * 8 + "abcdefgh".index(square[0])
+
+
+def parse_int(value, name: str) -> int:
+    """An integer parameter, sent as a JSON number or a string
+
+    Raises:
+        ValueError: If the value is not an integer
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def parse_move(engine: Engine, move) -> Move:
+    """The legal move described by {"from", "to", "promotion"}, UCI or SAN
+
+    Raises:
+        ValueError: If the move is malformed or illegal in the engine position
+    """
+    if isinstance(move, dict):
+        from_pos = parse_square(move.get("from"))
+        to_pos = parse_square(move.get("to"))
+        promotion = move.get("promotion") or ""
+        return engine.uci_to_move(
+            engine._get_pgn_from_index(from_pos)
+            + engine._get_pgn_from_index(to_pos)
+            + str(promotion).lower()
+        )
+    if not isinstance(move, str):
+        raise ValueError(f"Invalid move {move}")
+    if UCI_RE.match(move.strip()):
+        return engine.uci_to_move(move)
+    return engine.san_to_move(move)
+
+
+def _move_map(engine: Engine) -> dict:
+    return {"legal_moves": {str(k): v for k, v in engine.legal_move_map().items()}}
+
+
+def legal_moves_of(engine: Engine) -> dict:
+    """Every legal move of the engine position, with its check status"""
+    move_map = engine.legal_move_map()
+    moves = [
+        {
+            "from": from_pos,
+            "to": to_pos,
+            "uci": engine.move_to_uci(from_pos, to_pos, promotion),
+            "san": engine.move_to_san(from_pos, to_pos, promotion),
+        }
+        for from_pos, to_pos, promotion in engine.legal_moves()
+    ]
+    status = engine.status()
+    return {
+        "fen": engine.get_fen_notation(),
+        "side_to_move": "w" if engine.active_color == Color.WHITE else "b",
+        "legal_moves": {str(k): v for k, v in move_map.items()},
+        "moves": moves,
+        "in_check": engine.is_in_check(engine.active_color),
+        "checkmate": status == GameStatus.CHECKMATE,
+        "status": status.value,
+    }
+
+
+def get_legal_moves(data: dict) -> tuple[int, dict]:
+    position = data.get("position")
+    if position is None:
+        return 400, {"error": "Position is required"}
+
+    # Without a FEN the moves are those of the starting position
+    try:
+        position = parse_int(position, "position")
+        if not 0 <= position < 64:
+            raise ValueError(f"Invalid position {position}")
+        move_map = cached("move_map", data.get("fen"), _move_map)["legal_moves"]
+        return 200, {"legal_moves": move_map.get(str(position), [])}
+    except ValueError:
+        return 400, {"error": "Invalid position or FEN"}
+
+
+def legal_moves(data: dict) -> tuple[int, dict]:
+    """Legal moves of every piece of the side to move, for any position"""
+    fen = data.get("fen")
+    if not fen:
+        return 400, {"error": "FEN is required"}
+
+    try:
+        return 200, cached("legal_moves", fen, legal_moves_of)
+    except ValueError:
+        return 400, {"error": "Invalid FEN"}
+
+
+def check_move(data: dict) -> tuple[int, dict]:
+    fen = data.get("fen")
+    from_pos = data.get("from")
+    to_pos = data.get("to")
+
+    if not fen or from_pos is None or to_pos is None:
+        return 400, {"error": "FEN, from, and to positions are required"}
+
+    try:
+        from_pos = parse_square(from_pos)
+        to_pos = parse_square(to_pos)
+        move_map = cached("move_map", fen, _move_map)["legal_moves"]
+        is_legal = to_pos in move_map.get(str(from_pos), [])
+        return 200, {"is_legal": is_legal}
+    except ValueError:
+        return 400, {"error": "Invalid positions"}
+
+
+def _check_game(fen: str | None, moves: list) -> dict:
+    """Play a game move by move, the moves after an illegal one are not played"""
+    results = []
+    first_illegal = None
+    with engines.engine(fen) as engine:
+        for i, move in enumerate(moves):
+            if first_illegal is not None:
+                results.append(
+                    {"is_legal": False, "error": "An earlier move is illegal"}
+                )
+                continue
+            try:
+                engine.make_move(*parse_move(engine, move))
+                results.append({"is_legal": True})
+            except ValueError as e:
+                first_illegal = i
+                results.append({"is_legal": False, "error": str(e)})
+        final_fen = engine.get_fen_notation()
+        status = engine.status().value
+
+    return {
+        "results": results,
+        "valid": first_illegal is None,
+        "first_illegal": first_illegal,
+        "final_fen": final_fen,
+        "status": status,
+    }
+
+
+def _check_items(items: list) -> dict:
+    """Check independent {fen, from, to} items, in one engine checkout"""
+    results = []
+    with engines.engine() as engine:
+        # FEN the engine is in, so consecutive moves of a game are not reloaded
+        current_fen = None
+        for item in items:
+            if not isinstance(item, dict) or not item.get("fen"):
+                results.append({"is_legal": False, "error": "FEN is required"})
+                continue
+            try:
+                if item["fen"] != current_fen:
+                    current_fen = None
+                    engines.load(engine, item["fen"])
+                    current_fen = item["fen"]
+                move = parse_move(engine, item)
+            except ValueError as e:
+                results.append({"is_legal": False, "error": str(e)})
+                continue
+
+            results.append({"is_legal": True})
+            engine.make_move(*move)
+            current_fen = engine.get_fen_notation()
+
+    return {"results": results, "valid": all(r["is_legal"] for r in results)}
+
+
+def check_moves(data: dict) -> tuple[int, dict]:
+    """
+    Validate many moves in one request
+
+    Either {"items": [{"fen", "from", "to"}, ...]} for unrelated positions, or
+    {"fen": optional start, "moves": [...]} for a whole game, where a move is
+    a UCI string, a SAN string or {"from", "to", "promotion"}.
+    """
+    items = data.get("items")
+    moves = data.get("moves")
+    if (items is None) == (moves is None):
+        return 400, {"error": "Either items or moves is required"}
+    batch = items if items is not None else moves
+    if not isinstance(batch, list):
+        return 400, {"error": "items and moves must be arrays"}
+    if len(batch) > MAX_BATCH_MOVES:
+        return 400, {"error": f"At most {MAX_BATCH_MOVES} moves per request"}
+
+    if items is not None:
+        return 200, _check_items(items)
+    try:
+        return 200, _check_game(data.get("fen"), moves)
+    except ValueError:
+        return 400, {"error": "Invalid FEN"}
+
+
+def explorer(data: dict) -> tuple[int, dict]:
+    fen = data.get("fen")
+    if not fen:
+        return 400, {"error": "FEN is required"}
+
+    index = get_position_index()
+    if index is None:
+        return 503, {"error": "No position index available"}
+
+    try:
+        limit = parse_int(data.get("limit", 10), "limit")
+        limit = min(max(limit, 0), EXPLORER_MAX_GAMES)
+        with engines.engine(fen) as engine:
+            game_ids, stats = index.move_stats(engine.zobrist_hash())
+            moves = []
+            ended_here = 0
+            for move_stats in stats:
+                if move_stats.move is None:
+                    ended_here = move_stats.games
+                    continue
+                moves.append(
+                    {
+                        "uci": engine.move_to_uci(*move_stats.move),
+                        "san": engine.move_to_san(*move_stats.move),
+                        "games": move_stats.games,
+                        "white_wins": move_stats.white_wins,
+                        "draws": move_stats.draws,
+                        "black_wins": move_stats.black_wins,
+                    }
+                )
+    except ValueError:
+        return 400, {"error": "Invalid FEN or limit"}
+
+    return 200, {
+        "games": len(game_ids),
+        "ended_here": ended_here,
+        "moves": moves,
+        "top_games": [
+            {"id": game_id, "headers": index.game_headers(game_id)}
+            for game_id in game_ids[:limit]
+        ],
+    }
+
+
+def analyse(
+    fen: str | None,
+    limits: SearchLimits,
+    info: Callable[[SearchResult], None] | None = None,
+) -> dict:
+    """
+    Best move of a position, from the analysis cache when it is deep enough
+
+    Args:
+        fen (str | None): The position, the starting position if None
+        limits (SearchLimits): Depth and time limits of the search
+        info (Callable[[SearchResult], None] | None): Called after every
+            completed iteration of the search
+
+    Raises:
+        ValueError: If the FEN is invalid
+
+    Returns:
+        dict: The best move, score and principal variation in UCI and SAN
+    """
+    key = ("analysis", normalize_fen(fen))
+    with engines.engine(key[1]) as engine:
+        with _analyses_lock:
+            analysis = analyses.get(key)
+            if analysis is None:
+                analysis = Analysis()
+            analyses.put(key, analysis)
+
+        with analysis.lock:
+            previous = analysis.result
+            result = Searcher(engine, analysis.table).search(limits, info, previous)
+            analysis.result = result
+
+        pv = []
+        for move in result.pv:
+            pv.append(
+                {"uci": engine.move_to_uci(*move), "san": engine.move_to_san(*move)}
+            )
+            engine.make_move(*move)
+        for _ in result.pv:
+            engine.undo_move()
+
+    best_move = result.best_move
+    return {
+        "fen": key[1],
+        "best_move": engine.move_to_uci(*best_move) if best_move else None,
+        "san": pv[0]["san"] if pv else None,
+        "score": result.score,
+        "mate": result.mate,
+        "depth": result.depth,
+        "pv": [move["uci"] for move in pv],
+        "pv_san": [move["san"] for move in pv],
+        "nodes": result.nodes,
+        "time_ms": result.time_ms,
+        "cached": previous is not None and result.depth == previous.depth,
+    }
+
+
+def parse_search_limits(data: dict) -> SearchLimits:
+    """Limits of a best move search from the depth and movetime_ms parameters
+
+    Raises:
+        ValueError: If neither is given or one is out of range
+    """
+    depth = data.get("depth")
+    movetime_ms = data.get("movetime_ms")
+    if depth is None and movetime_ms is None:
+        raise ValueError("depth or movetime_ms is required")
+    if depth is not None:
+        depth = parse_int(depth, "depth")
+        if not 1 <= depth <= MAX_ANALYSIS_DEPTH:
+            raise ValueError(f"depth must be 1 to {MAX_ANALYSIS_DEPTH}")
+    if movetime_ms is not None:
+        movetime_ms = parse_int(movetime_ms, "movetime_ms")
+        if not 1 <= movetime_ms <= MAX_ANALYSIS_MOVETIME_MS:
+            raise ValueError(f"movetime_ms must be 1 to {MAX_ANALYSIS_MOVETIME_MS}")
+    # Without a depth the search deepens until the time is up
+    return SearchLimits(depth=depth or MAX_ANALYSIS_DEPTH, movetime_ms=movetime_ms)
+
+
+def best_move(data: dict) -> tuple[int, dict]:
+    """
+    Best move of a position within a depth or a time budget
+
+    The score is in centipawns from the side to move's point of view.
+    """
+    fen = data.get("fen")
+    if not fen:
+        return 400, {"error": "FEN is required"}
+
+    try:
+        limits = parse_search_limits(data)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    try:
+        return 200, analyse(fen, limits)
+    except ValueError:
+        return 400, {"error": "Invalid FEN"}
+
+
+# Deepest search per ply when streaming the analysis of a game
+MAX_STREAM_EVAL_DEPTH = 3
+
+
+def parse_eval_depth(value) -> int | None:
+    """Evaluation asked for in a game analysis: None, 0 (static) or a depth
+
+    Raises:
+        ValueError: If the depth is not an integer in range
+    """
+    if value is None or value == "":
+        return None
+    depth = parse_int(value, "depth")
+    if not 0 <= depth <= MAX_STREAM_EVAL_DEPTH:
+        raise ValueError(f"depth must be 0 to {MAX_STREAM_EVAL_DEPTH}")
+    return depth
+
+
+def _evaluation(engine: Engine, depth: int, table: TranspositionTable) -> dict:
+    """Score of the engine position from white's point of view"""
+    sign = 1 if engine.active_color == Color.WHITE else -1
+    if engine.status() == GameStatus.CHECKMATE:
+        return {"score": -sign * MATE_SCORE, "mate": 0}
+    if depth == 0:
+        return {"score": evaluate(engine), "mate": None}
+
+    result = Searcher(engine, table).search(SearchLimits(depth=depth))
+    return {
+        "score": sign * result.score,
+        "mate": sign * result.mate if result.mate is not None else None,
+        "best_move": (
+            engine.move_to_uci(*result.best_move) if result.best_move else None
+        ),
+    }
+
+
+def analyse_games(source: TextIO, depth: int | None = None) -> Iterator[dict]:
+    """
+    Replay the games of a PGN, describing every ply as soon as it is played
+
+    Games are read one at a time and records are yielded, never collected,
+    and the undo history of every ply is dropped once it is played, so memory
+    does not grow with the length of the upload. Only the repetition counts
+    of the current game are kept.
+
+    Args:
+        source (TextIO): The PGN text, read lazily
+        depth (int | None): None for no evaluation, 0 for the static
+            evaluation, else the search depth of every ply
+
+    Returns:
+        Iterator[dict]: Per game a "game" record, a "ply" record per move up
+            to the first illegal one, and an "end" record
+    """
+    with engines.engine() as engine:
+        for game in read_games(source):
+            yield {"type": "game", "game": game.index, "headers": game.headers}
+            # Consecutive positions of a game share most of their search tree
+            table = TranspositionTable(ANALYSIS_TABLE_MB) if depth else None
+            error = None
+            played = 0
+            try:
+                engines.load(engine, game.start_fen)
+                moves = game.moves
+            except ValueError:
+                error = f"Invalid FEN {game.start_fen}"
+                moves = []
+
+            for ply, san in enumerate(moves, 1):
+                record = {"type": "ply", "game": game.index, "ply": ply, "san": san}
+                try:
+                    move = engine.san_to_move(san)
+                except ValueError as e:
+                    error = str(e)
+                    yield {**record, "legal": False, "error": error}
+                    break
+
+                record["uci"] = engine.move_to_uci(*move)
+                engine.make_move(*move)
+                # Replayed moves are never taken back
+                engine.clear_history()
+                played = ply
+                record["legal"] = True
+                record["fen"] = engine.get_fen_notation()
+                record["check"] = engine.is_in_check(engine.active_color)
+                record["status"] = engine.status().value
+                if depth is not None:
+                    record["eval"] = _evaluation(engine, depth, table)
+                yield record
+
+            yield {
+                "type": "end",
+                "game": game.index,
+                "plies": played,
+                "result": game.result,
+                "valid": error is None,
+                "error": error,
+                "final_fen": engine.get_fen_notation() if error is None else None,
+            }
+
+
+# Puzzles are validated in the request thread, so a request is kept small:
+# few puzzles, short lines and shallow searches. A mate in n is searched 2n - 1
+# plies deep, as deep as the longest line accepted. Anything larger goes
+# through a check_puzzles job.
+MAX_BATCH_PUZZLES = 3
+MAX_SYNC_PUZZLE_DEPTH = 2
+MAX_SYNC_PUZZLE_PLIES = 3
+MAX_SYNC_MATE_DEPTH = MAX_SYNC_PUZZLE_PLIES
+
+
+def parse_puzzles(
+    data: dict,
+    limit: int,
+    max_depth: int = MAX_PUZZLE_DEPTH,
+    max_plies: int | None = None,
+) -> tuple[list[Puzzle], int]:
+    """Puzzles and search depth of a validation request
+
+    Args:
+        data (dict): {"puzzles": [...], "depth": optional}
+        limit (int): Most puzzles accepted
+        max_depth (int): Deepest search depth accepted, also the default
+            depth when it is below DEFAULT_DEPTH
+        max_plies (int | None): Longest solution accepted, None for any
+
+    Raises:
+        ValueError: If a puzzle or the depth is invalid, or there are too many
+    """
+    items = data.get("puzzles")
+    if not isinstance(items, list) or not items:
+        raise ValueError("puzzles must be a non-empty array")
+    if len(items) > limit:
+        raise ValueError(f"At most {limit} puzzles per request, submit a job")
+    depth = parse_int(data.get("depth", min(DEFAULT_DEPTH, max_depth)), "depth")
+    if not 1 <= depth <= max_depth:
+        raise ValueError(f"depth must be 1 to {max_depth}")
+    puzzles = [Puzzle.from_dict(item, i) for i, item in enumerate(items)]
+    if max_plies is not None and any(len(p.moves) > max_plies for p in puzzles):
+        raise ValueError(f"At most {max_plies} moves per puzzle, submit a job")
+    return puzzles, depth
+
+
+def check_puzzles(data: dict) -> tuple[int, dict]:
+    """
+    Check that puzzles have a unique winning line
+
+    {"puzzles": [{"id", "fen", "moves"}, ...], "depth": optional}, where the
+    side to move is the solver and moves alternate solver and opponent.
+    Larger batches and deeper searches go through a check_puzzles job.
+    """
+    try:
+        puzzles, depth = parse_puzzles(
+            data, MAX_BATCH_PUZZLES, MAX_SYNC_PUZZLE_DEPTH, MAX_SYNC_PUZZLE_PLIES
+        )
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    start = time.perf_counter()
+    results = list(
+        validate_puzzles(puzzles, depth, processes=1, max_depth=MAX_SYNC_MATE_DEPTH)
+    )
+    return 200, {
+        "results": [result.to_dict() for result in results],
+        "summary": summarize(results, time.perf_counter() - start),
+    }
+
+
+def cache_stats(data: dict) -> tuple[int, dict]:
+    return 200, {**results.stats(), "analyses": analyses.stats()}
+
+
+# Path -> allowed methods and handler
+ROUTES: dict[str, tuple[tuple[str, ...], Handler]] = {
+    "/api/v1/get_legal_moves/": (("GET", "POST"), get_legal_moves),
+    "/api/v1/legal_moves/": (("GET", "POST"), legal_moves),
+    "/api/v1/check_move/": (("GET", "POST"), check_move),
+    "/api/v1/check_moves/": (("POST",), check_moves),
+    "/api/v1/best_move/": (("GET", "POST"), best_move),
+    "/api/v1/check_puzzles/": (("POST",), check_puzzles),
+    "/api/v1/explorer/": (("POST",), explorer),
+    "/api/v1/cache_stats/": (("GET",), cache_stats),
+}
+
+
+def warm_up(_=None) -> None:
+    """Create an engine so a worker's first request does not pay for it"""
+    with engines.engine():
+        pass
+
+
+def dispatch(path: str, data: dict) -> tuple[int, dict]:
+    """Run the handler of a path, the entry point of worker processes"""
+    return ROUTES[path][1](data)
@@ -0,0 +1,346 @@
+"""
+Analysis jobs too long for one HTTP request, run on a local process pool
+
+A job is submitted, gets an ID at once and is polled for progress until its
+result is ready. Jobs wait in a priority queue where the shortest estimated
+job goes first, and no client has more than a few jobs running at a time, so
+one client's batch of deep searches cannot starve everyone else.
+"""
+
+import heapq
+import io
+import itertools
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import handlers
+from engine_pool import validate_fen
+from pgn import read_games
+from puzzles import summarize, validate_puzzles
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+JOB_TYPES = ("best_move", "analyse_pgn", "check_puzzles")
+
+# Largest PGN accepted for a game analysis job
+MAX_JOB_PLIES = 1000
+MAX_JOB_PUZZLES = 1000
+
+
+class JobRejected(Exception):
+    """Raised by JobQueue.submit when a limit does not allow another job"""
+
+    def __init__(self, message: str, client_limit: bool):
+        super().__init__(message)
+        self.client_limit = client_limit
+
+
+def estimate_seconds(depth: int | None) -> float:
+    """Rough cost of analysing one position, each ply of depth is ~20x"""
+    if depth is None:
+        return 0.001
+    return 0.002 if depth == 0 else 0.01 * 20 ** (depth - 1)
+
+
+def prepare(data: dict) -> tuple[str, dict, float]:
+    """
+    Validate the parameters of a job and estimate how long it will run
+
+    Args:
+        data (dict): {"type": "best_move", "fen", "depth" and/or
+            "movetime_ms"}, {"type": "analyse_pgn", "pgn", "depth"} or
+            {"type": "check_puzzles", "puzzles", "depth"}
+
+    Raises:
+        ValueError: If the type or a parameter is invalid
+
+    Returns:
+        tuple[str, dict, float]: Job type, parameters and estimated seconds
+    """
+    job_type = data.get("type")
+    if job_type == "best_move":
+        fen = data.get("fen")
+        if not fen:
+            raise ValueError("FEN is required")
+        validate_fen(handlers.normalize_fen(fen))
+        limits = handlers.parse_search_limits(data)
+        cost = estimate_seconds(limits.depth)
+        if limits.movetime_ms is not None:
+            cost = min(cost, limits.movetime_ms / 1000)
+        return job_type, {"fen": fen, "limits": limits}, cost
+
+    if job_type == "analyse_pgn":
+        pgn = data.get("pgn")
+        if not isinstance(pgn, str) or not pgn.strip():
+            raise ValueError("pgn is required")
+        depth = handlers.parse_eval_depth(data.get("depth"))
+        plies = sum(len(game.moves) for game in read_games(io.StringIO(pgn)))
+        if plies > MAX_JOB_PLIES:
+            raise ValueError(f"At most {MAX_JOB_PLIES} plies per job")
+        return job_type, {"pgn": pgn, "depth": depth}, plies * estimate_seconds(depth)
+
+    if job_type == "check_puzzles":
+        puzzles, depth = handlers.parse_puzzles(data, MAX_JOB_PUZZLES)
+        # Two searches per solver move, most puzzles have two or three
+        cost = len(puzzles) * 4 * estimate_seconds(depth)
+        return job_type, {"puzzles": puzzles, "depth": depth}, cost
+
+    raise ValueError(f"type must be one of {', '.join(JOB_TYPES)}")
+
+
+# Progress messages of the worker processes, set by the pool initializer
+_progress_queue = None
+
+
+def _init_worker(progress_queue) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _report(job_id: str, progress: dict) -> None:
+    _progress_queue.put((job_id, progress))
+
+
+def run_job(job_id: str, job_type: str, params: dict) -> dict:
+    """Run a job in a worker process, reporting progress as it goes"""
+    if job_type == "best_move":
+
+        def info(result) -> None:
+            _report(
+                job_id,
+                {"depth": result.depth, "nodes": result.nodes, "score": result.score},
+            )
+
+        return handlers.analyse(params["fen"], params["limits"], info)
+
+    if job_type == "check_puzzles":
+        results = []
+        start = time.perf_counter()
+        total = len(params["puzzles"])
+        for result in validate_puzzles(params["puzzles"], params["depth"], 1):
+            results.append(result)
+            _report(job_id, {"puzzles": len(results), "total": total})
+        return {
+            "results": [result.to_dict() for result in results],
+            "summary": summarize(results, time.perf_counter() - start),
+        }
+
+    records = []
+    plies = 0
+    for record in handlers.analyse_games(io.StringIO(params["pgn"]), params["depth"]):
+        records.append(record)
+        if record["type"] == "ply":
+            plies += 1
+            _report(job_id, {"plies": plies})
+    return {"records": records}
+
+
+class Job:
+    """A submitted job and everything known about it so far"""
+
+    def __init__(self, job_type: str, params: dict, cost: float, client: str):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.cost = cost
+        self.client = client
+        self.status = QUEUED
+        self.progress: dict = {}
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "estimated_seconds": self.cost,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Jobs by ID, run shortest first on a bounded pool of worker processes
+
+    Only as many jobs as there are workers are handed to the pool, the rest
+    wait here so the priority order holds until a worker is actually free.
+
+    Args:
+        workers (int): Worker processes, at most this many jobs run at once
+        max_queued (int): Jobs waiting at once, beyond this submit fails
+        max_running_per_client (int): Jobs of one client running at once,
+            the client's other jobs wait even if workers are free
+        max_pending_per_client (int): Queued and running jobs of one client
+        max_finished (int): Finished jobs kept for polling, oldest dropped
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_queued: int = 1000,
+        max_running_per_client: int = 2,
+        max_pending_per_client: int = 20,
+        max_finished: int = 1000,
+    ):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_queued = max_queued
+        self.max_running_per_client = max_running_per_client
+        self.max_pending_per_client = max_pending_per_client
+        self.max_finished = max_finished
+
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._queue: list[tuple[float, int, Job]] = []
+        self._sequence = itertools.count()
+        self._finished: OrderedDict[str, None] = OrderedDict()
+        self._running = 0
+        self._running_by_client: Counter[str] = Counter()
+        self._pending_by_client: Counter[str] = Counter()
+
+        # Workers are spawned, forking a threaded server is not safe
+        self._context = multiprocessing.get_context("spawn")
+        self._progress = self._context.Queue()
+        self._pool = self._new_pool()
+        self._listener = threading.Thread(
+            target=self._listen, name="job-progress", daemon=True
+        )
+        self._listener.start()
+
+    def submit(self, job_type: str, params: dict, cost: float, client: str) -> Job:
+        """
+        Queue a job
+
+        Raises:
+            JobRejected: If the queue or the client's share of it is full
+        """
+        job = Job(job_type, params, cost, client)
+        with self._lock:
+            if self._pending_by_client[client] >= self.max_pending_per_client:
+                raise JobRejected(
+                    f"At most {self.max_pending_per_client} jobs per client",
+                    client_limit=True,
+                )
+            if len(self._queue) >= self.max_queued:
+                raise JobRejected("Job queue full, retry later", client_limit=False)
+            self._jobs[job.id] = job
+            self._pending_by_client[client] += 1
+            heapq.heappush(self._queue, (cost, next(self._sequence), job))
+            self._schedule()
+        return job
+
+    def describe(self, job_id: str) -> dict | None:
+        """Snapshot of a job, None if it is unknown or was dropped"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": len(self._queue),
+                "running": self._running,
+                "finished": len(self._finished),
+            }
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._progress,),
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._progress.put(None)
+
+    def _schedule(self) -> None:
+        """Start the shortest eligible jobs while workers are free, lock held"""
+        skipped = []
+        while self._queue and self._running < self.workers:
+            entry = heapq.heappop(self._queue)
+            job = entry[2]
+            if self._running_by_client[job.client] >= self.max_running_per_client:
+                skipped.append(entry)
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            self._running_by_client[job.client] += 1
+            pool = self._pool
+            try:
+                future = pool.submit(run_job, job.id, job.type, job.params)
+            except BrokenProcessPool:
+                self._finish(job, None, "Job workers restarting, retry")
+                self._replace_pool(pool)
+                continue
+            future.add_done_callback(
+                lambda f, job=job, pool=pool: self._done(job, f, pool)
+            )
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Start a new pool after a worker died, lock held
+
+        The dead worker breaks the whole pool: its running jobs fail, and so
+        would every later submission. Each failed job reports the pool it ran
+        on, so the pool is replaced once, not once per job. A broken pool has
+        already stopped its workers, and shutting it down from a done
+        callback would deadlock on its own lock.
+        """
+        if broken is self._pool:
+            self._pool = self._new_pool()
+
+    def _done(self, job: Job, future: Future, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                self._finish(job, None, str(e) or type(e).__name__)
+                self._replace_pool(pool)
+            except Exception as e:
+                self._finish(job, None, str(e) or type(e).__name__)
+            else:
+                self._finish(job, result, None)
+            self._schedule()
+
+    def _finish(self, job: Job, result: dict | None, error: str | None) -> None:
+        """Record the outcome of a running job, lock held"""
+        job.result = result
+        job.error = error
+        job.status = FAILED if error is not None else DONE
+        job.finished_at = time.time()
+        job.params = {}
+        self._running -= 1
+        self._running_by_client[job.client] -= 1
+        self._pending_by_client[job.client] -= 1
+
+        self._finished[job.id] = None
+        while len(self._finished) > self.max_finished:
+            old_id, _ = self._finished.popitem(last=False)
+            del self._jobs[old_id]
+
+    def _listen(self) -> None:
+        while (message := self._progress.get()) is not None:
+            job_id, progress = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == RUNNING:
+                    job.progress = progress
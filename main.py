@@ -1,6 +1,6 @@
 import pygame_gui.core.text
 import pygame_gui.ui_manager
-from engine import Engine, Color
+from engine import Engine, Color, GameStatus
 import pygame
 from ui import ChessUI
 from enum import Enum
@@ -26,6 +26,7 @@ class GameState(str, Enum):
     PLAYING = "playing"
     BLACK_WIN = "black_win"
     WHITE_WIN = "white_win"
+    DRAW = "draw"
     MAIN_MENU = "main_menu"
     OPTION_MENU = "option_menu"
 
@@ -68,10 +69,15 @@ def main() -> None:
             manager.process_events(event)
 
         if game_state == GameState.PLAYING:
-            if engine.is_checkmate(Color.BLACK):
-                game_state = GameState.WHITE_WIN
-            elif engine.is_checkmate(Color.WHITE):
-                game_state = GameState.BLACK_WIN
+            status = engine.status()
+            if status == GameStatus.CHECKMATE:
+                game_state = (
+                    GameState.WHITE_WIN
+                    if engine.active_color == Color.BLACK
+                    else GameState.BLACK_WIN
+                )
+            elif status.is_draw:
+                game_state = GameState.DRAW
 
             # Get current time
             current_time = pygame.time.get_ticks()
@@ -98,6 +104,10 @@ def main() -> None:
             screen.fill(pygame.Color(255, 255, 255))
             go_back_button = pygame_gui.elements.UIButton((250, 250), "Go back")
 
+        if game_state == GameState.DRAW:
+            screen.fill(pygame.Color(128, 128, 128))
+            go_back_button = pygame_gui.elements.UIButton((250, 250), "Go back")
+
         if game_state == GameState.MAIN_MENU:
             screen.fill(pygame.Color(36, 26, 4))
             play_button.visible = True
@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import multiprocessing
+import re
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+from engine import Engine
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+TAG_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+
+
+class PgnGame:
+    """A game read from a PGN file: its tag pairs and SAN moves"""
+
+    def __init__(
+        self, index: int, headers: dict[str, str], moves: list[str], result: str
+    ):
+        self.index = index
+        self.headers = headers
+        self.moves = moves
+        self.result = result
+
+    def __repr__(self) -> str:
+        return f"PgnGame({self.index}, {len(self.moves)} moves, {self.result})"
+
+    @property
+    def start_fen(self) -> str | None:
+        return self.headers.get("FEN")
+
+
+def _movetext_tokens(text: str) -> Iterator[str]:
+    """Split movetext into SAN tokens, dropping comments, variations and NAGs"""
+    depth = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "{":
+            end = text.find("}", i)
+            i = len(text) if end == -1 else end + 1
+            continue
+        if char == ";":
+            end = text.find("\n", i)
+            i = len(text) if end == -1 else end + 1
+            continue
+        if char == "(":
+            depth += 1
+            i += 1
+            continue
+        if char == ")":
+            depth = max(depth - 1, 0)
+            i += 1
+            continue
+        if char.isspace():
+            i += 1
+            continue
+
+        start = i
+        while i < len(text) and not text[i].isspace() and text[i] not in "{;()":
+            i += 1
+        token = text[start:i]
+        if depth:
+            continue
+        token = MOVE_NUMBER_RE.sub("", token)
+        if token and not token.startswith("$"):
+            yield token
+
+
+def read_games(source: str | Path | TextIO) -> Iterator[PgnGame]:
+    """
+    Lazily read the games of a PGN file, one at a time
+
+    Only the game being parsed is held in memory, so archives of any size can
+    be streamed.
+
+    Args:
+        source (str | Path | TextIO): A path or an open text file
+
+    Returns:
+        Iterator[PgnGame]: The games, in file order
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from read_games(f)
+        return
+
+    index = 0
+    headers: dict[str, str] = {}
+    movetext: list[str] = []
+    in_comment = False
+
+    def finish() -> PgnGame:
+        tokens = list(_movetext_tokens("\n".join(movetext)))
+        result = headers.get("Result", "*")
+        if tokens and tokens[-1] in RESULTS:
+            result = tokens.pop()
+        return PgnGame(index, dict(headers), tokens, result)
+
+    for line in source:
+        line = line.strip()
+
+        # Tags only start a game outside of a multi-line comment
+        if not in_comment and line.startswith("["):
+            if movetext:
+                yield finish()
+                index += 1
+                headers, movetext = {}, []
+            match = TAG_RE.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"')
+            continue
+
+        if line:
+            movetext.append(line)
+            if in_comment and "}" not in line:
+                continue
+            in_comment = line.rfind("{") > line.rfind("}")
+
+    if movetext or headers:
+        yield finish()
+
+
+class ReplayResult:
+    """Outcome of replaying one game"""
+
+    def __init__(
+        self,
+        index: int,
+        plies: int,
+        final_fen: str,
+        error: str | None = None,
+    ):
+        self.index = index
+        self.plies = plies
+        self.final_fen = final_fen
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else self.error
+        return f"ReplayResult({self.index}, {self.plies} plies, {status})"
+
+
+def replay_game(game: PgnGame, engine: Engine | None = None) -> ReplayResult:
+    """
+    Play every move of a game, stopping at the first illegal one
+
+    Args:
+        game (PgnGame): The game to check
+        engine (Engine | None): Engine to reuse, a new one is created if None
+
+    Returns:
+        ReplayResult: Plies played, final position and the error if any
+    """
+    engine = engine or Engine()
+    try:
+        if game.start_fen:
+            engine.load_fen_notation(game.start_fen)
+        else:
+            engine.load_fen_notation()
+    except (ValueError, KeyError, IndexError):
+        return ReplayResult(game.index, 0, "", f"Invalid FEN {game.start_fen}")
+
+    for ply, san in enumerate(game.moves):
+        try:
+            from_pos, to_pos, promotion = engine.san_to_move(san)
+        except ValueError as e:
+            move_number = engine.full_move
+            return ReplayResult(
+                game.index, ply, engine.get_fen_notation(), f"{e} at move {move_number}"
+            )
+        engine.make_move(from_pos, to_pos, promotion)
+
+    return ReplayResult(game.index, len(game.moves), engine.get_fen_notation())
+
+
+# One engine per worker process, reused for every game it replays
+_worker_engine: Engine | None = None
+
+
+def _replay_in_worker(game: PgnGame) -> ReplayResult:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine()
+    return replay_game(game, _worker_engine)
+
+
+def replay_games(
+    games: Iterable[PgnGame], processes: int | None = None, chunksize: int = 64
+) -> Iterator[ReplayResult]:
+    """
+    Replay games across a pool of worker processes
+
+    Games are handed out in bounded batches so that a lazily read archive is
+    never loaded whole. Results come back in game order.
+
+    Args:
+        games (Iterable[PgnGame]): The games, typically from read_games
+        processes (int | None): Worker count, defaults to the CPU count
+        chunksize (int): Games sent to a worker at a time
+
+    Returns:
+        Iterator[ReplayResult]: One result per game
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1:
+        engine = Engine()
+        for game in games:
+            yield replay_game(game, engine)
+        return
+
+    games = iter(games)
+    batch_size = processes * chunksize * 4
+    with multiprocessing.Pool(processes) as pool:
+        while batch := list(itertools.islice(games, batch_size)):
+            yield from pool.imap(_replay_in_worker, batch, chunksize)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate every move of a PGN archive")
+    parser.add_argument("path", type=Path, help="PGN file to replay")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=64, help="Games per worker task"
+    )
+    parser.add_argument(
+        "--fens", action="store_true", help="Print the final position of every game"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = plies = errors = 0
+    for result in replay_games(read_games(args.path), args.processes, args.chunksize):
+        games += 1
+        plies += result.plies
+        if not result.ok:
+            errors += 1
+            print(f"Game {result.index}: {result.error}")
+        elif args.fens:
+            print(f"Game {result.index}: {result.final_fen}")
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{games} games, {plies} plies, {errors} with illegal moves "
+        f"in {elapsed:.2f}s ({games / elapsed if elapsed else 0:.1f} games/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
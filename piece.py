@@ -1,26 +1,13 @@
-from pydantic import BaseModel
-from enum import Enum
+from pydantic import BaseModel, ConfigDict
 import struct
+from core import Color, PieceType
 from protocols import Request, Response
 
 
-class Color(Enum):
-    EMPTY = 0
-    WHITE = 1
-    BLACK = 2
-
-
-class PieceType(str, Enum):
-    PAWN = "p"
-    KNIGHT = "n"
-    BISHOP = "b"
-    ROOK = "r"
-    QUEEN = "q"
-    KING = "k"
-    EMPTY = "0"
-
-
 class Piece(BaseModel):
+    # Lets the engine's plain core.Piece objects be validated directly
+    model_config = ConfigDict(from_attributes=True)
+
     piece_type: PieceType
     board_index: int
     color: Color
@@ -0,0 +1,412 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from engine import UCI_RE, Engine, GameStatus, Move
+from engine_pool import validate_fen
+from search import SearchLimits, SearchResult, Searcher, TranspositionTable
+
+# A move wins when it keeps at least this advantage, in centipawns
+WIN_SCORE = 200
+DEFAULT_DEPTH = 3
+# Mate puzzles are searched deep enough to see the whole mate, up to this
+MAX_PUZZLE_DEPTH = 5
+PUZZLE_TABLE_MB = 4
+
+
+class Puzzle:
+    """
+    A tactics puzzle: the position and its solution line
+
+    The side to move in the FEN is the solver. Moves alternate between the
+    solver and the opponent's forced replies, starting and ending with the
+    solver.
+    """
+
+    def __init__(self, index: int, id: str, fen: str, moves: list[str]):
+        self.index = index
+        self.id = id
+        self.fen = fen
+        self.moves = moves
+
+    def __repr__(self) -> str:
+        return f"Puzzle({self.index}, {self.id!r}, {len(self.moves)} moves)"
+
+    @classmethod
+    def from_dict(cls, data: dict, index: int = 0) -> "Puzzle":
+        """
+        A puzzle from {"id", "fen", "moves"}, moves a list or a string
+
+        Raises:
+            ValueError: If the FEN or the moves are missing or not strings
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("fen"), str):
+            raise ValueError("Puzzle FEN is required")
+        moves = data.get("moves")
+        if isinstance(moves, str):
+            moves = moves.split()
+        if not moves or not isinstance(moves, list):
+            raise ValueError("Puzzle moves are required")
+        if not all(isinstance(move, str) for move in moves):
+            raise ValueError("Puzzle moves must be strings")
+        return cls(index, str(data.get("id", index)), data["fen"], list(moves))
+
+
+def read_puzzles(source: str | Path) -> Iterator[Puzzle]:
+    """
+    Lazily read puzzles from a file
+
+    A .csv file is in the Lichess puzzle format: PuzzleId, FEN and Moves
+    columns where the first move is the opponent's, played before the puzzle
+    starts. Any other file holds one JSON puzzle per line.
+
+    Args:
+        source (str | Path): The file
+
+    Returns:
+        Iterator[Puzzle]: The puzzles, in file order
+    """
+    path = Path(source)
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            for index, row in enumerate(csv.DictReader(f)):
+                setup, *moves = row["Moves"].split()
+                engine = Engine()
+                engine.load_fen_notation(row["FEN"])
+                engine.make_move(*engine.uci_to_move(setup))
+                yield Puzzle(
+                    index,
+                    row.get("PuzzleId", str(index)),
+                    engine.get_fen_notation(),
+                    moves,
+                )
+            return
+
+        index = 0
+        for line in f:
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            yield Puzzle.from_dict(json.loads(line), index)
+            index += 1
+
+
+class PuzzleResult:
+    """Verdict on one puzzle, with the analysis of every solver move"""
+
+    def __init__(
+        self,
+        index: int,
+        id: str,
+        valid: bool,
+        reason: str | None,
+        mate_in: int | None,
+        claimed_mate: int | None,
+        steps: list[dict],
+        nodes: int,
+        time_ms: int,
+    ):
+        self.index = index
+        self.id = id
+        self.valid = valid
+        self.reason = reason
+        self.mate_in = mate_in
+        self.claimed_mate = claimed_mate
+        self.steps = steps
+        self.nodes = nodes
+        self.time_ms = time_ms
+
+    def __repr__(self) -> str:
+        status = "valid" if self.valid else self.reason
+        return f"PuzzleResult({self.index}, {self.id!r}, {status})"
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "id": self.id,
+            "valid": self.valid,
+            "reason": self.reason,
+            "mate_in": self.mate_in,
+            "claimed_mate": self.claimed_mate,
+            "steps": self.steps,
+            "nodes": self.nodes,
+            "time_ms": self.time_ms,
+        }
+
+
+def _parse_move(engine: Engine, move: str) -> Move:
+    if UCI_RE.match(move.strip()):
+        return engine.uci_to_move(move)
+    return engine.san_to_move(move)
+
+
+def _describe(engine: Engine, result: SearchResult | None) -> dict | None:
+    if result is None or result.best_move is None:
+        return None
+    return {
+        "move": engine.move_to_uci(*result.best_move),
+        "score": result.score,
+        "mate": result.mate,
+    }
+
+
+def _wins(result: SearchResult) -> bool:
+    if result.mate is not None:
+        return result.mate > 0
+    return result.score >= WIN_SCORE
+
+
+def validate_puzzle(
+    puzzle: Puzzle,
+    depth: int = DEFAULT_DEPTH,
+    engine: Engine | None = None,
+    max_depth: int = MAX_PUZZLE_DEPTH,
+) -> PuzzleResult:
+    """
+    Check that every solver move wins and that no other move does
+
+    Each solver move is searched on its own, then every other move together.
+    A move wins with a mate for the solver or a score of at least WIN_SCORE.
+    When the line ends in mate, the search goes deep enough to see the rest of
+    it and an alternative only spoils the puzzle if it mates as fast.
+
+    Args:
+        puzzle (Puzzle): The puzzle to check
+        depth (int): Search depth of each move, deeper for mates
+        engine (Engine | None): Engine to reuse, a new one is created if None
+        max_depth (int): Deepest search, even to see the whole of a mate
+
+    Returns:
+        PuzzleResult: Whether the puzzle is sound, why not, and the true mate
+            distance when the solver mates
+    """
+    engine = engine or Engine()
+    start = time.perf_counter()
+    nodes = 0
+
+    def result(valid, reason, mate_in=None, claimed=None, steps=()) -> PuzzleResult:
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return PuzzleResult(
+            puzzle.index,
+            puzzle.id,
+            valid,
+            reason,
+            mate_in,
+            claimed,
+            list(steps),
+            nodes,
+            elapsed_ms,
+        )
+
+    try:
+        validate_fen(puzzle.fen)
+        engine.load_fen_notation(puzzle.fen)
+    except ValueError:
+        return result(False, f"Invalid FEN {puzzle.fen}")
+    if len(puzzle.moves) % 2 == 0:
+        return result(False, "The solution must end with a solver move")
+
+    # Every move of the line must be legal before anything is searched
+    line: list[Move] = []
+    for ply, move in enumerate(puzzle.moves, 1):
+        try:
+            line.append(_parse_move(engine, move))
+        except ValueError as e:
+            return result(False, f"{e} at ply {ply}")
+        engine.make_move(*line[-1])
+    solver_moves = (len(line) + 1) // 2
+    claimed_mate = solver_moves if engine.status() == GameStatus.CHECKMATE else None
+    engine.load_fen_notation(puzzle.fen)
+
+    table = TranspositionTable(PUZZLE_TABLE_MB)
+    steps = []
+    mate_in = None
+    for ply in range(0, len(line), 2):
+        move = line[ply]
+        search_depth = depth
+        if claimed_mate is not None:
+            remaining = solver_moves - ply // 2
+            search_depth = min(max(depth, 2 * remaining - 1), max_depth)
+
+        searcher = Searcher(engine, table)
+        own = searcher.search(SearchLimits(depth=search_depth, searchmoves=[move]))
+        others = [m for m in engine.legal_moves() if m != move]
+        alternative = None
+        if others:
+            alternative = searcher.search(
+                SearchLimits(depth=search_depth, searchmoves=others)
+            )
+        nodes += own.nodes + (alternative.nodes if alternative else 0)
+
+        if ply == 0:
+            mates = [r.mate for r in (own, alternative) if r and r.mate and r.mate > 0]
+            mate_in = min(mates) if mates else None
+        steps.append(
+            {
+                "move": engine.move_to_uci(*move),
+                "score": own.score,
+                "mate": own.mate,
+                "alternative": _describe(engine, alternative),
+            }
+        )
+
+        if not _wins(own):
+            reason = f"Solution move {steps[-1]['move']} does not win"
+            return result(False, reason, mate_in, claimed_mate, steps)
+        if alternative is not None and _wins(alternative):
+            also_wins = own.mate is None or (
+                alternative.mate is not None and alternative.mate <= own.mate
+            )
+            if also_wins:
+                reason = (
+                    f"{steps[-1]['alternative']['move']} also wins "
+                    f"instead of {steps[-1]['move']}"
+                )
+                return result(False, reason, mate_in, claimed_mate, steps)
+
+        engine.make_move(*move)
+        if ply + 1 < len(line):
+            engine.make_move(*line[ply + 1])
+
+    if claimed_mate is not None and mate_in != claimed_mate:
+        reason = (
+            f"Mate in {mate_in}, the solution takes {claimed_mate}"
+            if mate_in
+            else f"Mate in {claimed_mate} not found at depth {max_depth}"
+        )
+        return result(False, reason, mate_in, claimed_mate, steps)
+    return result(True, None, mate_in, claimed_mate, steps)
+
+
+# One engine per worker process, reused for every puzzle it checks
+_worker_engine: Engine | None = None
+
+
+def _validate_in_worker(args: tuple[Puzzle, int, int]) -> PuzzleResult:
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = Engine()
+    puzzle, depth, max_depth = args
+    return validate_puzzle(puzzle, depth, _worker_engine, max_depth)
+
+
+def validate_puzzles(
+    puzzles: Iterable[Puzzle],
+    depth: int = DEFAULT_DEPTH,
+    processes: int | None = None,
+    max_depth: int = MAX_PUZZLE_DEPTH,
+) -> Iterator[PuzzleResult]:
+    """
+    Validate puzzles across a pool of worker processes
+
+    Args:
+        puzzles (Iterable[Puzzle]): The puzzles, typically from read_puzzles
+        depth (int): Search depth of each move, deeper for mates
+        processes (int | None): Worker count, defaults to the CPU count
+        max_depth (int): Deepest search, even to see the whole of a mate
+
+    Returns:
+        Iterator[PuzzleResult]: One result per puzzle, in input order
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1:
+        engine = Engine()
+        for puzzle in puzzles:
+            yield validate_puzzle(puzzle, depth, engine, max_depth)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        # One puzzle per task, each is several searches long
+        tasks = ((puzzle, depth, max_depth) for puzzle in puzzles)
+        yield from pool.imap(_validate_in_worker, tasks, 1)
+
+
+def _reason_kind(reason: str) -> str:
+    """A rejection reason without its moves, so similar ones count together"""
+    if "also wins" in reason:
+        return "alternative wins"
+    if "does not win" in reason:
+        return "solution does not win"
+    if reason.startswith("Mate"):
+        return "mate distance"
+    return "invalid input"
+
+
+def summarize(results: list[PuzzleResult], wall_time_s: float) -> dict:
+    """
+    Aggregate figures of a run: how many puzzles pass, why the rest fail
+
+    Args:
+        results (list[PuzzleResult]): Results of every puzzle
+        wall_time_s (float): Duration of the whole run
+
+    Returns:
+        dict: Counts, rejection reasons and throughput
+    """
+    valid = [r for r in results if r.valid]
+    nodes = sum(r.nodes for r in results)
+    search_ms = sum(r.time_ms for r in results)
+    reasons = Counter(_reason_kind(r.reason) for r in results if not r.valid)
+    return {
+        "puzzles": len(results),
+        "valid": len(valid),
+        "rejected": len(results) - len(valid),
+        "reasons": dict(reasons),
+        "mates": sum(r.mate_in is not None for r in valid),
+        "nodes": nodes,
+        "nps": nodes * 1000 // search_ms if search_ms else 0,
+        "wall_time_s": round(wall_time_s, 3),
+        "puzzles_per_s": round(len(results) / wall_time_s, 2) if wall_time_s else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that tactics puzzles have a unique winning line"
+    )
+    parser.add_argument("path", type=Path, help="Lichess CSV or JSON lines file")
+    parser.add_argument(
+        "--depth", type=int, default=DEFAULT_DEPTH, help="Search depth per move"
+    )
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="JSON file, stdout if unset"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = list(
+        validate_puzzles(read_puzzles(args.path), args.depth, args.processes)
+    )
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "puzzles": str(args.path),
+        "timestamp": int(time.time()),
+        "depth": args.depth,
+        "processes": args.processes or multiprocessing.cpu_count(),
+        "summary": summarize(results, elapsed),
+        "results": [r.to_dict() for r in results],
+    }
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    summary = report["summary"]
+    print(
+        f"{summary['valid']}/{summary['puzzles']} puzzles valid in "
+        f"{summary['wall_time_s']}s ({summary['puzzles_per_s']} puzzles/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
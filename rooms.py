@@ -1,4 +1,5 @@
-from engine import Engine, Piece
+from engine import Color, Engine, GameStatus
+from piece import Piece
 from pydantic import TypeAdapter
 
 
@@ -24,6 +25,19 @@ class Room:
         else:
             return False, "Invalid move"
 
+    def get_status(self) -> GameStatus:
+        return self.engine.status()
+
+    def get_winner(self) -> str | None:
+        """Returns "white", "black" or "draw" once the game is over, else None"""
+        status = self.get_status()
+        if not status.is_over:
+            return None
+        if status == GameStatus.CHECKMATE:
+            # The side to move is the one that got mated
+            return "black" if self.engine.active_color == Color.WHITE else "white"
+        return "draw"
+
     def get_full_board(self):
         ListPieceValidator = TypeAdapter(list[Piece])
         board = ListPieceValidator.validate_python(self.engine.board)
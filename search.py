@@ -0,0 +1,386 @@
+import threading
+import time
+from collections.abc import Callable
+
+from core import Color, PieceType
+from engine import PIECE_INDEX, Engine, Move
+from evaluation import EvalParams, evaluate
+
+MATE_SCORE = 100000
+# Scores beyond this are mates, the distance is encoded in the remainder
+MATE_THRESHOLD = MATE_SCORE - 1000
+MAX_DEPTH = 64
+
+# Rough memory of one transposition table entry, used to size it in megabytes
+TT_ENTRY_BYTES = 160
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# Victim values for most valuable victim / least valuable attacker ordering
+VICTIM_VALUE = {
+    PieceType.PAWN: 1,
+    PieceType.KNIGHT: 3,
+    PieceType.BISHOP: 3,
+    PieceType.ROOK: 5,
+    PieceType.QUEEN: 9,
+    PieceType.KING: 0,
+}
+
+
+class SearchLimits:
+    """When a search should stop; with none set it runs to MAX_DEPTH"""
+
+    def __init__(
+        self,
+        depth: int | None = None,
+        movetime_ms: int | None = None,
+        nodes: int | None = None,
+        infinite: bool = False,
+        searchmoves: list[Move] | None = None,
+    ):
+        self.depth = depth
+        self.movetime_ms = movetime_ms
+        self.nodes = nodes
+        self.infinite = infinite
+        # Root moves to consider, all legal moves if None
+        self.searchmoves = searchmoves
+
+
+class SearchResult:
+    """Best line found by the last completed iteration of a search"""
+
+    def __init__(
+        self,
+        best_move: Move | None,
+        score: int,
+        depth: int,
+        nodes: int,
+        time_ms: int,
+        pv: list[Move],
+    ):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.time_ms = time_ms
+        self.pv = pv
+
+    @property
+    def mate(self) -> int | None:
+        """Moves to mate, negative when being mated, None if no mate was found"""
+        if abs(self.score) < MATE_THRESHOLD:
+            return None
+        moves = (MATE_SCORE - abs(self.score) + 1) // 2
+        return moves if self.score > 0 else -moves
+
+    @property
+    def nps(self) -> int:
+        return self.nodes * 1000 // max(self.time_ms, 1)
+
+    def __repr__(self) -> str:
+        return (
+            f"SearchResult({self.best_move}, score={self.score}, depth={self.depth}, "
+            f"nodes={self.nodes})"
+        )
+
+
+class TranspositionTable:
+    """Search results by position hash, oldest entries are dropped when full"""
+
+    def __init__(self, size_mb: int = 16):
+        self.entries: dict[int, tuple[int, int, int, Move | None]] = {}
+        self.resize(size_mb)
+
+    def resize(self, size_mb: int) -> None:
+        self.max_entries = max(size_mb * 1024 * 1024 // TT_ENTRY_BYTES, 1)
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get(self, key: int) -> tuple[int, int, int, Move | None] | None:
+        return self.entries.get(key)
+
+    def store(
+        self, key: int, depth: int, score: int, flag: int, move: Move | None
+    ) -> None:
+        entry = self.entries.get(key)
+        # Keep deeper results of the same position
+        if entry is not None and entry[0] > depth:
+            return
+        if entry is None and len(self.entries) >= self.max_entries:
+            del self.entries[next(iter(self.entries))]
+        self.entries[key] = (depth, score, flag, move)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SearchStopped(Exception):
+    """Raised inside the search tree when a limit is reached or stop is called"""
+
+
+class Searcher:
+    """
+    Iterative deepening alpha-beta search over an Engine
+
+    Moves are played and taken back on the engine itself, which is left in
+    its starting position when search returns. The search runs in the calling
+    thread; another thread may call stop() to end it early.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: TranspositionTable | None = None,
+        params: EvalParams | None = None,
+    ):
+        self.engine = engine
+        self.table = table or TranspositionTable()
+        self.params = params
+        self.stop_event = threading.Event()
+        self.nodes = 0
+        self._limits = SearchLimits()
+        self._deadline: float | None = None
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def search(
+        self,
+        limits: SearchLimits | None = None,
+        info: Callable[[SearchResult], None] | None = None,
+        previous: SearchResult | None = None,
+    ) -> SearchResult:
+        """
+        Search the position of the engine for the best move
+
+        Args:
+            limits (SearchLimits | None): Depth, time and node limits
+            info (Callable[[SearchResult], None] | None): Called after every
+                completed iteration
+            previous (SearchResult | None): An earlier search of the same
+                position with the same table, iterations resume after its
+                depth and it is returned if none completes
+
+        Returns:
+            SearchResult: The result of the deepest completed iteration
+        """
+        self._limits = limits or SearchLimits()
+        self.stop_event.clear()
+        self.nodes = 0
+        start = time.perf_counter()
+        self._deadline = None
+        if self._limits.movetime_ms is not None and not self._limits.infinite:
+            self._deadline = start + self._limits.movetime_ms / 1000
+
+        root_moves = self._root_moves()
+        result = SearchResult(root_moves[0] if root_moves else None, 0, 0, 0, 0, [])
+        if not root_moves:
+            # Mated, unless the legal moves were only left out by searchmoves
+            if self._limits.searchmoves is None and self.engine.is_in_check(
+                self.engine.active_color
+            ):
+                result.score = -MATE_SCORE
+            return result
+
+        first_depth = 1
+        if previous is not None and previous.best_move in root_moves:
+            result = SearchResult(
+                previous.best_move, previous.score, previous.depth, 0, 0, previous.pv
+            )
+            first_depth = previous.depth + 1
+            if abs(previous.score) >= MATE_THRESHOLD and not self._limits.infinite:
+                return result
+
+        max_depth = min(self._limits.depth or MAX_DEPTH, MAX_DEPTH)
+        for depth in range(first_depth, max_depth + 1):
+            pv: list[Move] = []
+            try:
+                score = self._negamax(depth, 0, -MATE_SCORE - 1, MATE_SCORE + 1, pv)
+            except SearchStopped:
+                break
+
+            elapsed_ms = int((time.perf_counter() - start) * 1000)
+            best_move = pv[0] if pv else result.best_move
+            result = SearchResult(best_move, score, depth, self.nodes, elapsed_ms, pv)
+            if info is not None:
+                info(result)
+
+            # A forced mate found within the horizon cannot get any shorter
+            if abs(score) >= MATE_THRESHOLD and not self._limits.infinite:
+                break
+
+        result.nodes = self.nodes
+        result.time_ms = int((time.perf_counter() - start) * 1000)
+        return result
+
+    def _root_moves(self) -> list[Move]:
+        moves = self.engine.legal_moves()
+        if self._limits.searchmoves is not None:
+            moves = [m for m in moves if m in self._limits.searchmoves]
+        return moves
+
+    def _check_limits(self) -> None:
+        if self.stop_event.is_set():
+            raise SearchStopped
+        if self._limits.nodes is not None and self.nodes >= self._limits.nodes:
+            raise SearchStopped
+        # Reading the clock is comparatively slow, do it every few nodes
+        if (
+            self._deadline is not None
+            and self.nodes % 64 == 0
+            and time.perf_counter() >= self._deadline
+        ):
+            raise SearchStopped
+
+    def _evaluate(self) -> int:
+        """Static evaluation from the side to move's point of view"""
+        score = evaluate(self.engine, self.params)
+        return score if self.engine.active_color == Color.WHITE else -score
+
+    def _is_capture(self, move: Move) -> bool:
+        engine = self.engine
+        if engine.board[move[1]].piece_type != PieceType.EMPTY:
+            return True
+        return (
+            engine.board[move[0]].piece_type == PieceType.PAWN
+            and engine.en_passant_target is not None
+            and move[1] == engine._get_index_from_pgn(engine.en_passant_target)
+        )
+
+    def _order_moves(self, moves: list[Move], tt_move: Move | None) -> list[Move]:
+        """Hash move first, then captures by MVV-LVA, then promotions"""
+        board = self.engine.board
+
+        def priority(move: Move) -> int:
+            if move == tt_move:
+                return 1000
+            victim = board[move[1]].piece_type
+            score = 0
+            if victim != PieceType.EMPTY:
+                score = 100 + VICTIM_VALUE[victim] * 10
+                score -= PIECE_INDEX[board[move[0]].piece_type]
+            elif self._is_capture(move):
+                score = 110
+            if self.engine._is_promotion(move[0], move[1]):
+                score += 50 if move[2] == PieceType.QUEEN else -50
+            return score
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _negamax(
+        self, depth: int, ply: int, alpha: int, beta: int, pv: list[Move]
+    ) -> int:
+        engine = self.engine
+        self.nodes += 1
+        self._check_limits()
+
+        if ply > 0:
+            if engine.half_move >= 100 or engine._has_insufficient_material():
+                return 0
+            # A repetition inside the search is scored as the draw it leads to
+            if engine._position_counts.get(engine._get_position_key(), 0) >= 2:
+                return 0
+
+        moves = engine.legal_moves()
+        if not moves:
+            if engine.is_in_check(engine.active_color):
+                return -MATE_SCORE + ply
+            return 0
+        # The score of a restricted root is not the position's, keep it out
+        # of the table
+        restricted = ply == 0 and self._limits.searchmoves is not None
+        if restricted:
+            moves = self._root_moves()
+
+        if depth <= 0:
+            return self._quiescence(ply, alpha, beta)
+
+        key = engine.zobrist_hash()
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                entry_score = _score_from_table(entry_score, ply)
+                if (
+                    flag == EXACT
+                    or (flag == LOWER_BOUND and entry_score >= beta)
+                    or (flag == UPPER_BOUND and entry_score <= alpha)
+                ):
+                    if tt_move is not None:
+                        pv[:] = [tt_move]
+                    return entry_score
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE - 1
+        best_move = None
+        for move in self._order_moves(moves, tt_move):
+            child_pv: list[Move] = []
+            engine.make_move(*move)
+            try:
+                score = -self._negamax(depth - 1, ply + 1, -beta, -alpha, child_pv)
+            finally:
+                engine.undo_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                pv[:] = [move, *child_pv]
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if not restricted:
+            self.table.store(
+                key, depth, _score_to_table(best_score, ply), flag, best_move
+            )
+        return best_score
+
+    def _quiescence(self, ply: int, alpha: int, beta: int) -> int:
+        """Resolve captures so positions are not evaluated mid-exchange"""
+        self.nodes += 1
+        self._check_limits()
+
+        stand_pat = self._evaluate()
+        if stand_pat >= beta or ply >= MAX_DEPTH:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        captures = [m for m in self.engine.legal_moves() if self._is_capture(m)]
+        for move in self._order_moves(captures, None):
+            self.engine.make_move(*move)
+            try:
+                score = -self._quiescence(ply + 1, -beta, -alpha)
+            finally:
+                self.engine.undo_move()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+
+def _score_to_table(score: int, ply: int) -> int:
+    """Store mate scores as distance from the stored node, not from the root"""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
@@ -0,0 +1,341 @@
+import argparse
+import math
+import multiprocessing
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from core import Color
+from engine import Engine, GameStatus
+from evaluation import EvalParams
+from search import SearchLimits, Searcher, TranspositionTable
+
+# Short, roughly balanced opening lines in UCI notation. Every opening is
+# played twice with colors reversed so neither side profits from it.
+OPENINGS = (
+    "e2e4 e7e5 g1f3 b8c6",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 e7e6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "c2c4 e7e5 b1c3 g8f6",
+    "g1f3 d7d5 g2g3 g8f6",
+    "e2e4 e7e5 f1c4 g8f6",
+    "d2d4 d7d5 g1f3 g8f6",
+    "e2e4 d7d6 d2d4 g8f6",
+)
+
+# Games still running after this many plies are scored as draws
+MAX_PLIES = 300
+
+
+class PlayerConfig:
+    """An engine configuration: the search budget and evaluation weights"""
+
+    def __init__(
+        self,
+        name: str,
+        limits: SearchLimits,
+        hash_mb: int = 16,
+        params: EvalParams | None = None,
+    ):
+        self.name = name
+        self.limits = limits
+        self.hash_mb = hash_mb
+        self.params = params
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "PlayerConfig":
+        """
+        Build a configuration from "key=value" pairs separated by commas
+
+        Keys are depth, movetime, nodes and hash, integers, and params, a file
+        of evaluation weights written by EvalParams.save, for example
+        "depth=3,hash=8,params=tuned.json".
+
+        Raises:
+            ValueError: If a key is unknown, a value is not an integer or the
+                params file cannot be read
+        """
+        values: dict[str, int] = {}
+        params = None
+        for item in filter(None, spec.split(",")):
+            key, _, value = item.partition("=")
+            key = key.strip()
+            if key == "params":
+                try:
+                    params = EvalParams.load(Path(value.strip()))
+                except OSError as e:
+                    raise ValueError(f"Cannot read {value.strip()}: {e}")
+                continue
+            if key not in ("depth", "movetime", "nodes", "hash"):
+                raise ValueError(f"Unknown option {key} in {spec}")
+            values[key] = int(value)
+        limits = SearchLimits(
+            depth=values.get("depth"),
+            movetime_ms=values.get("movetime"),
+            nodes=values.get("nodes"),
+        )
+        if limits.depth is None and limits.movetime_ms is None and limits.nodes is None:
+            raise ValueError(f"No search limit in {spec}")
+        return cls(name, limits, values.get("hash", 16), params)
+
+
+class GameResult:
+    """Outcome of one game, from the point of view of the first player"""
+
+    def __init__(self, opening: int, first_is_white: bool, score: float, reason: str):
+        self.opening = opening
+        self.first_is_white = first_is_white
+        self.score = score
+        self.reason = reason
+
+    def __repr__(self) -> str:
+        return f"GameResult({self.opening}, {self.score}, {self.reason})"
+
+
+def play_game(
+    first: PlayerConfig,
+    second: PlayerConfig,
+    opening: str,
+    first_is_white: bool,
+    opening_index: int = 0,
+) -> GameResult:
+    """
+    Play one game between two configurations, adjudicated by the engine rules
+
+    Args:
+        first (PlayerConfig): The configuration results are reported for
+        second (PlayerConfig): Its opponent
+        opening (str): UCI moves played before the engines take over
+        first_is_white (bool): Whether the first configuration plays white
+        opening_index (int): Recorded in the result
+
+    Returns:
+        GameResult: 1, 0.5 or 0 for the first configuration and the reason
+    """
+    engine = Engine()
+    for uci in opening.split():
+        engine.make_move(*engine.uci_to_move(uci))
+
+    white, black = (first, second) if first_is_white else (second, first)
+    searchers = {
+        Color.WHITE: Searcher(engine, TranspositionTable(white.hash_mb), white.params),
+        Color.BLACK: Searcher(engine, TranspositionTable(black.hash_mb), black.params),
+    }
+    limits = {Color.WHITE: white.limits, Color.BLACK: black.limits}
+
+    plies = 0
+    while not engine.status().is_over and plies < MAX_PLIES:
+        color = engine.active_color
+        result = searchers[color].search(limits[color])
+        engine.make_move(*result.best_move)
+        plies += 1
+
+    status = engine.status()
+    if status == GameStatus.CHECKMATE:
+        # The side to move has been mated
+        first_color = Color.WHITE if first_is_white else Color.BLACK
+        score = 0.0 if engine.active_color == first_color else 1.0
+    else:
+        score = 0.5
+    reason = status.value if status.is_over else "max_plies"
+    return GameResult(opening_index, first_is_white, score, reason)
+
+
+def _play_in_worker(args: tuple) -> GameResult:
+    first, second, opening_index, first_is_white = args
+    return play_game(
+        first, second, OPENINGS[opening_index], first_is_white, opening_index
+    )
+
+
+def expected_score(elo: float) -> float:
+    """Expected score of a player rated elo points above its opponent"""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_stats(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    """Mean score per game and its per-game variance"""
+    games = wins + draws + losses
+    if not games:
+        return 0.5, 0.0
+    score = (wins + draws / 2) / games
+    variance = (
+        wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score**2
+    ) / games
+    return score, variance
+
+
+def elo_estimate(wins: int, draws: int, losses: int) -> tuple[float, float]:
+    """
+    Elo difference implied by a match result, with its 95% error margin
+
+    Args:
+        wins (int): Games won by the first configuration
+        draws (int): Games drawn
+        losses (int): Games lost by the first configuration
+
+    Returns:
+        tuple[float, float]: The Elo difference and the margin around it
+    """
+    games = wins + draws + losses
+    score, variance = score_stats(wins, draws, losses)
+
+    def to_elo(s: float) -> float:
+        s = min(max(s, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / s - 1)
+
+    if not games:
+        return 0.0, 0.0
+    deviation = 1.96 * math.sqrt(variance / games)
+    margin = (to_elo(score + deviation) - to_elo(score - deviation)) / 2
+    return to_elo(score), margin
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    """
+    Log-likelihood ratio of H1 (elo1) against H0 (elo0)
+
+    Uses the normal approximation of the generalized SPRT on the game scores.
+    """
+    games = wins + draws + losses
+    score, variance = score_stats(wins, draws, losses)
+    if not games or variance == 0:
+        return 0.0
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple[float, float]:
+    """Lower and upper LLR bounds for the given error rates"""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def _game_tasks(
+    first: PlayerConfig, second: PlayerConfig, games: int
+) -> Iterator[tuple]:
+    for i in range(games):
+        # Consecutive games share an opening with colors swapped
+        yield first, second, (i // 2) % len(OPENINGS), i % 2 == 0
+
+
+def run_match(
+    first: PlayerConfig,
+    second: PlayerConfig,
+    games: int,
+    processes: int | None = None,
+    elo0: float = 0.0,
+    elo1: float = 10.0,
+    alpha: float = 0.05,
+    beta: float = 0.05,
+) -> Iterator[tuple[GameResult, tuple[int, int, int], float]]:
+    """
+    Play a match across a pool of worker processes, stopping on an SPRT verdict
+
+    Args:
+        first (PlayerConfig): The configuration being tested
+        second (PlayerConfig): The baseline
+        games (int): Upper limit of games
+        processes (int | None): Worker count, defaults to the CPU count
+        elo0 (float): Elo difference of the null hypothesis
+        elo1 (float): Elo difference of the alternative hypothesis
+        alpha (float): Accepted false positive rate
+        beta (float): Accepted false negative rate
+
+    Returns:
+        Iterator[tuple[GameResult, tuple[int, int, int], float]]: Every
+            finished game with the running wins, draws, losses and LLR
+    """
+    processes = processes or multiprocessing.cpu_count()
+    lower, upper = sprt_bounds(alpha, beta)
+    wins = draws = losses = 0
+    with multiprocessing.Pool(processes) as pool:
+        # Leaving the pool terminates games still running once SPRT decides
+        for result in pool.imap_unordered(
+            _play_in_worker, _game_tasks(first, second, games)
+        ):
+            if result.score == 1:
+                wins += 1
+            elif result.score == 0:
+                losses += 1
+            else:
+                draws += 1
+            llr = sprt_llr(wins, draws, losses, elo0, elo1)
+            yield result, (wins, draws, losses), llr
+            if not lower < llr < upper:
+                return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play two engine configurations")
+    parser.add_argument(
+        "--first",
+        default="nodes=2000",
+        help='Tested configuration, e.g. "depth=3,params=tuned.json"',
+    )
+    parser.add_argument("--second", default="nodes=1000", help="Baseline")
+    parser.add_argument("-n", "--games", type=int, default=1000, help="Maximum games")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT null Elo")
+    parser.add_argument("--elo1", type=float, default=10.0, help="SPRT alternative")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="Also log every game here"
+    )
+    args = parser.parse_args()
+
+    first = PlayerConfig.parse("first", args.first)
+    second = PlayerConfig.parse("second", args.second)
+    lower, upper = sprt_bounds(args.alpha, args.beta)
+
+    start = time.perf_counter()
+    played = 0
+    llr = 0.0
+    wins = draws = losses = 0
+    log = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for result, (wins, draws, losses), llr in run_match(
+            first,
+            second,
+            args.games,
+            args.processes,
+            args.elo0,
+            args.elo1,
+            args.alpha,
+            args.beta,
+        ):
+            played += 1
+            if log is not None:
+                log.write(
+                    f"{result.opening} {'w' if result.first_is_white else 'b'} "
+                    f"{result.score} {result.reason}\n"
+                )
+            elo, margin = elo_estimate(wins, draws, losses)
+            minutes = (time.perf_counter() - start) / 60
+            print(
+                f"Games {played}: +{wins} ={draws} -{losses}  "
+                f"Elo {elo:+.1f} +/- {margin:.1f}  "
+                f"LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]  "
+                f"{played / minutes:.1f} games/min"
+            )
+    finally:
+        if log is not None:
+            log.close()
+
+    if llr >= upper:
+        verdict = "H1 accepted, first is stronger"
+    elif llr <= lower:
+        verdict = "H0 accepted, no improvement"
+    else:
+        verdict = "inconclusive, game limit reached"
+    print(f"SPRT({args.elo0}, {args.elo1}): {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -146,6 +146,10 @@ class Server:
             if success:
                 self.send_to_opponent(Response.DONE_MOVE, data, client)
                 self.send(Response.DONE_MOVE, data, client)
+                winner = room.get_winner()
+                if winner is not None:
+                    self.send_to_opponent(Response.WINNER, winner, client)
+                    self.send(Response.WINNER, winner, client)
             else:
                 self.send(Response.ERROR, error, client)
         if r_type == Request.GET_LEGAL_MOVES:
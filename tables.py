@@ -0,0 +1,283 @@
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+# Bump whenever the layout or the content of the tables changes
+TABLES_VERSION = 3
+TABLES_MAGIC = b"CHESSTBL"
+# Written in native byte order, a file from another architecture reads back wrong
+BYTE_ORDER_CHECK = 0x0102030405060708
+ZOBRIST_SEED = 0x5EED_C4E55
+
+# Directions as (row, col) offsets, index 0 = a8 like the board array
+DIRECTIONS = (
+    (-1, 0),  # north
+    (-1, 1),  # north east
+    (0, 1),  # east
+    (1, 1),  # south east
+    (1, 0),  # south
+    (1, -1),  # south west
+    (0, -1),  # west
+    (-1, -1),  # north west
+)
+ROOK_DIRECTION_INDEXES = (0, 2, 4, 6)
+BISHOP_DIRECTION_INDEXES = (1, 3, 5, 7)
+QUEEN_DIRECTION_INDEXES = tuple(range(8))
+# Rays going towards higher indexes are walked from their lowest bit
+ASCENDING_DIRECTION_INDEXES = frozenset((2, 3, 4, 5))
+
+KNIGHT_OFFSETS = (
+    (-2, -1),
+    (-2, 1),
+    (2, -1),
+    (2, 1),
+    (-1, -2),
+    (-1, 2),
+    (1, -2),
+    (1, 2),
+)
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Section name -> number of uint64 entries, in file order
+SECTIONS = (
+    ("knight_attacks", 64),
+    ("king_attacks", 64),
+    ("pawn_attacks", 2 * 64),  # [white, black][square]
+    ("rays", 8 * 64),  # [direction][square]
+    ("zobrist_pieces", 12 * 64),  # [color * 6 + piece][square]
+    ("zobrist_castling", 4),  # K, Q, k, q
+    ("zobrist_en_passant", 8),  # [file]
+    ("zobrist_side", 1),  # black to move
+)
+# magic, version, entry count, byte order check, SHA-256 of the entries
+HEADER = struct.Struct("=8sIIQ32s")
+ENTRY_COUNT = sum(size for _, size in SECTIONS)
+FILE_SIZE = HEADER.size + ENTRY_COUNT * 8
+
+
+def default_tables_path() -> Path:
+    """
+    Path of the table file, shared by the processes of one user
+
+    CHESS_TABLES_PATH overrides the default, which lives in the user's cache
+    directory ($XDG_CACHE_HOME, else ~/.cache) rather than a world-writable
+    one where another user could own or plant the file.
+    """
+    path = os.environ.get("CHESS_TABLES_PATH")
+    if path:
+        return Path(path)
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "chessengine" / f"tables-v{TABLES_VERSION}.bin"
+
+
+def _offsets_mask(square: int, offsets) -> int:
+    row, col = square // 8, square % 8
+    mask = 0
+    for row_offset, col_offset in offsets:
+        new_row, new_col = row + row_offset, col + col_offset
+        if 0 <= new_row < 8 and 0 <= new_col < 8:
+            mask |= 1 << (new_row * 8 + new_col)
+    return mask
+
+
+def _ray_squares(square: int, direction: tuple[int, int]) -> list[int]:
+    row, col = square // 8, square % 8
+    row_dir, col_dir = direction
+    squares = []
+    row, col = row + row_dir, col + col_dir
+    while 0 <= row < 8 and 0 <= col < 8:
+        squares.append(row * 8 + col)
+        row, col = row + row_dir, col + col_dir
+    return squares
+
+
+def _build_entries() -> array:
+    entries = array("Q")
+
+    entries.extend(_offsets_mask(sq, KNIGHT_OFFSETS) for sq in range(64))
+    entries.extend(_offsets_mask(sq, KING_OFFSETS) for sq in range(64))
+    # White pawns capture towards row 0, black pawns towards row 7
+    entries.extend(_offsets_mask(sq, ((-1, -1), (-1, 1))) for sq in range(64))
+    entries.extend(_offsets_mask(sq, ((1, -1), (1, 1))) for sq in range(64))
+
+    for direction in DIRECTIONS:
+        for sq in range(64):
+            mask = 0
+            for target in _ray_squares(sq, direction):
+                mask |= 1 << target
+            entries.append(mask)
+
+    # Fixed seed so that hashes stay comparable between builds and machines
+    rng = random.Random(ZOBRIST_SEED)
+    hash_count = 12 * 64 + 4 + 8 + 1
+    entries.extend(rng.getrandbits(64) for _ in range(hash_count))
+
+    assert len(entries) == ENTRY_COUNT
+    return entries
+
+
+def _table_bytes() -> bytes:
+    """Content of the table file: the header then the entries"""
+    entries = _build_entries().tobytes()
+    header = HEADER.pack(
+        TABLES_MAGIC,
+        TABLES_VERSION,
+        ENTRY_COUNT,
+        BYTE_ORDER_CHECK,
+        hashlib.sha256(entries).digest(),
+    )
+    return header + entries
+
+
+def build_tables(path: Path | None = None) -> Path:
+    """Write the lookup table file, replacing any existing one atomically
+
+    Args:
+        path (Path | None): Destination, defaults to default_tables_path()
+
+    Returns:
+        Path: The path that was written
+    """
+    path = Path(path) if path is not None else default_tables_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    content = _table_bytes()
+
+    # Concurrent builders each write their own file, the last rename wins
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _is_valid(path: Path) -> bool:
+    """Whether a table file is complete and its entries match their checksum"""
+    try:
+        if path.stat().st_size != FILE_SIZE:
+            return False
+        with open(path, "rb") as f:
+            content = f.read()
+        magic, version, count, order, digest = HEADER.unpack_from(content)
+    except (OSError, struct.error):
+        return False
+    return (
+        magic == TABLES_MAGIC
+        and version == TABLES_VERSION
+        and count == ENTRY_COUNT
+        and order == BYTE_ORDER_CHECK
+        and hashlib.sha256(content[HEADER.size :]).digest() == digest
+    )
+
+
+class Tables:
+    """Read-only view over a memory-mapped table file
+
+    Every process mapping the same file shares its pages, so the tables cost
+    neither build time nor resident memory per worker. Sections are exposed
+    as flat uint64 memoryviews, see SECTIONS for their layout.
+
+    Args:
+        path (Path | None): The table file to map, None for tables held in
+            this process only
+        content (bytes | None): Content of a table file, used when path is None
+    """
+
+    def __init__(self, path: Path | None, content: bytes | None = None):
+        self.path = path
+        if path is not None:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            content = self._mmap
+
+        view = memoryview(content)[HEADER.size :].cast("Q")
+        offset = 0
+        for name, size in SECTIONS:
+            setattr(self, name, view[offset : offset + size])
+            offset += size
+
+    # Tables are read-only, copies share the mapping and pickles remap the file
+    def __copy__(self) -> "Tables":
+        return self
+
+    def __deepcopy__(self, memo) -> "Tables":
+        return self
+
+    def __reduce__(self):
+        return (load_tables, (self.path,))
+
+    def pawn_attacks_for(self, white: bool, square: int) -> int:
+        return self.pawn_attacks[(0 if white else 64) + square]
+
+    def ray(self, direction_index: int, square: int) -> int:
+        return self.rays[direction_index * 64 + square]
+
+    def iter_ray(self, direction_index: int, square: int):
+        """Yield the squares of a ray, nearest to the starting square first"""
+        ray = self.rays[direction_index * 64 + square]
+        if direction_index in ASCENDING_DIRECTION_INDEXES:
+            while ray:
+                lsb = ray & -ray
+                yield lsb.bit_length() - 1
+                ray ^= lsb
+        else:
+            while ray:
+                square = ray.bit_length() - 1
+                yield square
+                ray ^= 1 << square
+
+
+def load_tables(path: Path | None = None) -> Tables:
+    """Map the table file, building it first when it is missing or stale
+
+    When the file can be neither written nor read, for example because the
+    cache directory is read-only, the tables are built in memory instead.
+
+    Args:
+        path (Path | None): Table file, defaults to default_tables_path()
+
+    Returns:
+        Tables: The mapped tables
+    """
+    path = Path(path) if path is not None else default_tables_path()
+    try:
+        if not _is_valid(path):
+            build_tables(path)
+        return Tables(path)
+    except OSError:
+        return Tables(None, _table_bytes())
+
+
+_tables: Tables | None = None
+
+
+def get_tables() -> Tables:
+    """Process-wide tables, mapped on first use"""
+    global _tables
+    if _tables is None:
+        _tables = load_tables()
+    return _tables
+
+
+def iter_squares(bitboard: int):
+    """Yield the indices of the set bits, lowest first"""
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"Tables written to {build_tables(target)}")
@@ -0,0 +1,48 @@
+import pytest
+
+from engine import Engine
+
+
+def zobrist(fen: str) -> int:
+    engine = Engine()
+    engine.load_fen_notation(fen)
+    return engine.zobrist_hash()
+
+
+def without_en_passant(fen: str) -> str:
+    fields = fen.split()
+    fields[3] = "-"
+    return " ".join(fields)
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        # No black pawn beside the a4 pawn
+        "rnbqkbnr/pppppppp/8/8/P7/8/1PPPPPPP/RNBQKBNR b KQkq a3 0 1",
+        # The capture would expose the king along the fifth rank
+        "8/8/8/K2pP2r/8/8/8/7k w - d6 0 1",
+    ],
+)
+def test_hash_ignores_en_passant_without_capture(fen):
+    assert zobrist(fen) == zobrist(without_en_passant(fen))
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        "rnbqkbnr/p1pppppp/8/8/Pp6/8/1PPPPPPP/RNBQKBNR b KQkq a3 0 1",
+        "rnbqkbnr/pppppp1p/8/8/6pP/8/PPPPPPP1/RNBQKBNR b KQkq h3 0 1",
+        "8/8/8/K2pP3/8/8/8/7k w - d6 0 1",
+    ],
+)
+def test_hash_includes_capturable_en_passant(fen):
+    assert zobrist(fen) != zobrist(without_en_passant(fen))
+
+
+def test_played_double_push_matches_fen_without_en_passant():
+    engine = Engine()
+    engine.make_move(*engine.uci_to_move("a2a4"))
+    assert engine.zobrist_hash() == zobrist(
+        "rnbqkbnr/pppppppp/8/8/P7/8/1PPPPPPP/RNBQKBNR b KQkq - 0 1"
+    )
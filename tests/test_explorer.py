@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import explorer
+import handlers
+
+
+def entries(hashes, games):
+    result = np.zeros(len(hashes), dtype=explorer.ENTRY_DTYPE)
+    result["hash"] = hashes
+    result["game"] = games
+    return result
+
+
+def test_merge_keeps_game_order_across_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(explorer, "MERGE_CHUNK", 2048)
+    # Both sources are longer than a chunk, with one position in every game
+    old = entries([7] * 2000 + [9] * 10, list(range(2000)) + list(range(10)))
+    new = entries([1] + [7] * 1500, [2000] + list(range(2001, 3501)))
+
+    path = tmp_path / "merged"
+    with open(path, "wb") as f:
+        explorer._merge_sorted([old, new], f)
+    merged = np.fromfile(path, dtype=explorer.ENTRY_DTYPE)
+
+    assert len(merged) == len(old) + len(new)
+    keys = list(zip(merged["hash"].tolist(), merged["game"].tolist()))
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize("limit", [None, [1], {"a": 1}, "x"])
+def test_explorer_rejects_invalid_limits(monkeypatch, limit):
+    monkeypatch.setattr(handlers, "get_position_index", lambda: object())
+    status, payload = handlers.dispatch(
+        "/api/v1/explorer/", {"fen": handlers.START_FEN, "limit": limit}
+    )
+    assert status == 400
+    assert "error" in payload
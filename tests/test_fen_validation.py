@@ -0,0 +1,107 @@
+import pytest
+
+import handlers
+from engine import Engine
+from engine_pool import EnginePool, validate_fen
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+INVALID_FENS = [
+    # A rank of 7 squares
+    "rnbqkbnr/ppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    # A rank of 9 squares
+    "rnbqkbnr/ppppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    # 7 ranks
+    "rnbqkbnr/pppppppp/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR W KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - -1 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 0",
+    # Castling rights without the king or the rook on its square
+    "7k/8/8/8/8/8/8/7K w K - 0 1",
+    "r3k2r/8/8/8/8/8/8/R3K1R1 w K - 0 1",
+    "r3k2r/8/8/8/8/8/8/R3K2R w KQkqK - 0 1",
+    "r3k2r/8/8/8/8/8/8/R3K2R w X - 0 1",
+    # En passant squares
+    "rnbqkbnr/pppppppp/8/8/P7/8/1PPPPPPP/RNBQKBNR b KQkq a6 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq i6 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e 0 1",
+    # Kings and pawns
+    "8/8/8/8/8/8/8/7K w - - 0 1",
+    "k6k/8/8/8/8/8/8/7K w - - 0 1",
+    "k6P/8/8/8/8/8/8/7K w - - 0 1",
+    "",
+]
+
+
+def test_valid_fens():
+    validate_fen(START_FEN)
+    validate_fen("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 12 40")
+    validate_fen("rnbqkbnr/pppppppp/8/8/P7/8/1PPPPPPP/RNBQKBNR b KQkq a3 0 1")
+    validate_fen("7k/8/8/8/8/8/8/7K w - - 0 1")
+
+
+@pytest.mark.parametrize("fen", INVALID_FENS)
+def test_invalid_fens(fen):
+    with pytest.raises(ValueError):
+        validate_fen(fen)
+
+
+@pytest.mark.parametrize("fen", [fen for fen in INVALID_FENS if fen] + [123, ["x"]])
+def test_pool_rejects_invalid_fens(fen):
+    pool = EnginePool()
+    with pytest.raises(ValueError), pool.engine(fen):
+        pass
+    assert pool.positions_loaded == 0
+
+
+def test_pool_keeps_engine_usable_after_invalid_fen():
+    pool = EnginePool(max_idle=1)
+    with pytest.raises(ValueError), pool.engine("7k/8/8/8/8/8/8/7K w K - 0 1"):
+        pass
+    with pool.engine() as engine:
+        assert isinstance(engine, Engine)
+        assert engine.get_fen_notation() == START_FEN
+
+
+@pytest.mark.parametrize(
+    "path, data",
+    [
+        ("/api/v1/check_move/", {"fen": 123, "from": 52, "to": 36}),
+        (
+            "/api/v1/check_move/",
+            {"fen": "7k/8/8/8/8/8/8/7K w K - 0 1", "from": 63, "to": 62},
+        ),
+        ("/api/v1/get_legal_moves/", {"fen": ["x"], "position": 52}),
+        ("/api/v1/get_legal_moves/", {"fen": INVALID_FENS[0], "position": 52}),
+        ("/api/v1/legal_moves/", {"fen": {"a": 1}}),
+        ("/api/v1/legal_moves/", {"fen": INVALID_FENS[3]}),
+        ("/api/v1/best_move/", {"fen": 123, "depth": 1}),
+        ("/api/v1/best_move/", {"fen": INVALID_FENS[2], "depth": 1}),
+        ("/api/v1/check_moves/", {"fen": 123, "moves": ["e2e4"]}),
+    ],
+)
+def test_handlers_answer_400(path, data):
+    status, payload = handlers.dispatch(path, data)
+    assert status == 400
+    assert "error" in payload
+
+
+def test_check_items_reports_invalid_fen():
+    status, payload = handlers.dispatch(
+        "/api/v1/check_moves/",
+        {"items": [{"fen": INVALID_FENS[0], "from": 52, "to": 36}]},
+    )
+    assert status == 200
+    assert payload["results"][0]["is_legal"] is False
+
+
+def test_puzzle_with_invalid_fen_is_reported():
+    status, payload = handlers.dispatch(
+        "/api/v1/check_puzzles/",
+        {"puzzles": [{"id": "a", "fen": INVALID_FENS[9], "moves": ["h1g1"]}]},
+    )
+    assert status == 200
+    assert payload["results"][0]["valid"] is False
@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+import handlers
+
+START_FEN = handlers.START_FEN
+
+
+@pytest.mark.parametrize("value", [[2], {"a": 1}, "x", True, 2.5])
+@pytest.mark.parametrize("key", ["depth", "movetime_ms"])
+def test_best_move_rejects_non_integer_limits(key, value):
+    status, payload = handlers.dispatch(
+        "/api/v1/best_move/", {"fen": START_FEN, key: value}
+    )
+    assert status == 400
+    assert key in payload["error"]
+
+
+def test_best_move_accepts_integer_strings():
+    status, payload = handlers.dispatch(
+        "/api/v1/best_move/", {"fen": START_FEN, "depth": "1"}
+    )
+    assert status == 200
+    assert payload["depth"] == 1
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"puzzles": [{"fen": START_FEN, "moves": [1]}]},
+        {"puzzles": [{"fen": START_FEN, "moves": ["e2e4", None, "d2d4"]}]},
+        {"puzzles": [{"fen": START_FEN, "moves": ["e2e4"]}], "depth": None},
+        {"puzzles": [{"fen": START_FEN, "moves": ["e2e4"]}], "depth": [1]},
+    ],
+)
+def test_check_puzzles_rejects_invalid_types(data):
+    status, payload = handlers.dispatch("/api/v1/check_puzzles/", data)
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("position", [[52], {"a": 1}, "e2", True, 64])
+def test_get_legal_moves_rejects_invalid_positions(position):
+    status, payload = handlers.dispatch(
+        "/api/v1/get_legal_moves/", {"fen": START_FEN, "position": position}
+    )
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("value", [[1], {"a": 1}, "x", True])
+def test_parse_eval_depth_rejects_non_integers(value):
+    with pytest.raises(ValueError, match="depth"):
+        handlers.parse_eval_depth(value)
+
+
+def test_analyse_games_keeps_no_undo_history(monkeypatch):
+    history_sizes = []
+    make_move = handlers.Engine.make_move
+
+    def recording_make_move(engine, *args):
+        history_sizes.append(len(engine._history))
+        return make_move(engine, *args)
+
+    monkeypatch.setattr(handlers.Engine, "make_move", recording_make_move)
+    pgn = io.StringIO("1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 *\n")
+    records = list(handlers.analyse_games(pgn))
+
+    assert records[-1]["plies"] == 8
+    assert records[-1]["valid"]
+    assert history_sizes == [0] * 8
@@ -0,0 +1,281 @@
+import argparse
+import math
+import multiprocessing
+import time
+from multiprocessing.pool import Pool
+from pathlib import Path
+
+import numpy as np
+
+from batch import BatchEvaluator
+from dataset import open_dataset, records_to_planes
+from evaluation import (
+    PIECE_ORDER,
+    EvalParams,
+    default_params_path,
+    get_params,
+    mirror_square,
+)
+
+# Tuned weights: material of pawn to queen, then the 6 x 64 piece-square
+# tables. The king is on the board in every position, its material cancels.
+TUNED_MATERIAL = PIECE_ORDER[:5]
+PARAM_COUNT = len(TUNED_MATERIAL) + 6 * 64
+MIRROR = np.array([mirror_square(sq) for sq in range(64)])
+
+
+def params_to_vector(params: EvalParams) -> np.ndarray:
+    material = [params.material[p] for p in TUNED_MATERIAL]
+    pst = [value for p in PIECE_ORDER for value in params.pst[p]]
+    return np.array(material + pst, dtype=np.float64)
+
+
+def vector_to_params(theta: np.ndarray, mobility: int) -> EvalParams:
+    theta = np.rint(theta).astype(int)
+    material = {p: int(theta[i]) for i, p in enumerate(TUNED_MATERIAL)}
+    material[PIECE_ORDER[5]] = 0
+    offset = len(TUNED_MATERIAL)
+    pst = {
+        p: theta[offset + 64 * i : offset + 64 * (i + 1)].tolist()
+        for i, p in enumerate(PIECE_ORDER)
+    }
+    return EvalParams(material, pst, mobility)
+
+
+def features(planes: np.ndarray) -> np.ndarray:
+    """
+    Linear features of the evaluation: the score is features @ theta
+
+    White pieces count +1 on their square, black pieces -1 on the mirrored
+    square, so one set of tables serves both colors.
+
+    Args:
+        planes (np.ndarray): (N, 12, 64) one-hot piece planes
+
+    Returns:
+        np.ndarray: (N, PARAM_COUNT) float32
+    """
+    diff = planes[:, :6, :].astype(np.float32) - planes[:, 6:, MIRROR]
+    material = diff[:, : len(TUNED_MATERIAL), :].sum(axis=2)
+    return np.concatenate([material, diff.reshape(len(diff), 6 * 64)], axis=1)
+
+
+def _sigmoid(scores: np.ndarray, k: float) -> np.ndarray:
+    """Expected score of white for an evaluation in centipawns"""
+    return 1 / (1 + np.power(10.0, -k * scores / 400))
+
+
+class Batch:
+    """Features of a slice of the dataset with the parts that do not change"""
+
+    def __init__(self, records: np.ndarray, mobility: int):
+        planes = records_to_planes(records)
+        self.features = features(planes)
+        self.targets = (records["result"].astype(np.float64) + 1) / 2
+        # Mobility is not tuned, its share of the score is a fixed offset
+        self.offset = np.zeros(len(records))
+        if mobility:
+            evaluator = BatchEvaluator(EvalParams(mobility=mobility))
+            self.offset = mobility * evaluator.features(planes)["mobility"]
+
+    def scores(self, theta: np.ndarray) -> np.ndarray:
+        return self.features @ theta + self.offset
+
+    def loss(self, theta: np.ndarray, k: float) -> float:
+        """Summed squared error of the predicted results"""
+        error = self.targets - _sigmoid(self.scores(theta), k)
+        return float(error @ error)
+
+    def gradient(self, theta: np.ndarray, k: float) -> tuple[np.ndarray, float]:
+        """Gradient of the summed squared error over theta, and that error"""
+        predicted = _sigmoid(self.scores(theta), k)
+        error = self.targets - predicted
+        # d sigmoid / d score = ln(10) * k / 400 * p * (1 - p)
+        slope = -2 * error * predicted * (1 - predicted) * math.log(10) * k / 400
+        return slope @ self.features, float(error @ error)
+
+
+def fit_k(
+    batch: Batch, theta: np.ndarray, low: float = 0.01, high: float = 10.0
+) -> float:
+    """
+    Scaling constant that best maps the current evaluation to game results
+
+    Golden-section search, the loss is unimodal in k.
+    """
+    ratio = (math.sqrt(5) - 1) / 2
+    for _ in range(40):
+        a = high - ratio * (high - low)
+        b = low + ratio * (high - low)
+        if batch.loss(theta, a) < batch.loss(theta, b):
+            high = b
+        else:
+            low = a
+    return (low + high) / 2
+
+
+# Dataset mapped once per worker process
+_worker_records: np.ndarray | None = None
+
+
+def _open_in_worker(path: Path) -> None:
+    global _worker_records
+    _worker_records = open_dataset(path)
+
+
+def _shard_gradient(args: tuple) -> tuple[np.ndarray, float, int]:
+    start, stop, theta, k, mobility = args
+    batch = Batch(_worker_records[start:stop], mobility)
+    gradient, loss = batch.gradient(theta, k)
+    return gradient, loss, stop - start
+
+
+class Tuner:
+    """
+    Minibatch Adam over the squared error between predicted and actual results
+
+    With more than one process every minibatch is split into shards whose
+    gradients are computed in parallel and summed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        params: EvalParams | None = None,
+        batch_size: int = 16384,
+        learning_rate: float = 1.0,
+        processes: int = 1,
+        limit: int | None = None,
+    ):
+        self.path = Path(path)
+        self.records = open_dataset(self.path)
+        self.size = min(len(self.records), limit or len(self.records))
+        self.params = params or get_params()
+        self.theta = params_to_vector(self.params)
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.processes = processes
+        self.k = 1.0
+        self._m = np.zeros(PARAM_COUNT)
+        self._v = np.zeros(PARAM_COUNT)
+        self._steps = 0
+
+    def fit_k(self, sample: int = 100_000) -> float:
+        batch = Batch(self.records[: min(sample, self.size)], self.params.mobility)
+        self.k = fit_k(batch, self.theta)
+        return self.k
+
+    def _gradient(
+        self, start: int, stop: int, pool: Pool | None
+    ) -> tuple[np.ndarray, float]:
+        if pool is None:
+            batch = Batch(self.records[start:stop], self.params.mobility)
+            return batch.gradient(self.theta, self.k)
+
+        bounds = np.linspace(start, stop, self.processes + 1).astype(int)
+        tasks = [
+            (int(a), int(b), self.theta, self.k, self.params.mobility)
+            for a, b in zip(bounds, bounds[1:])
+            if b > a
+        ]
+        results = pool.map(_shard_gradient, tasks)
+        return sum(r[0] for r in results), sum(r[1] for r in results)
+
+    def _step(self, gradient: np.ndarray, count: int) -> None:
+        beta1, beta2 = 0.9, 0.999
+        gradient = gradient / count
+        self._steps += 1
+        self._m = beta1 * self._m + (1 - beta1) * gradient
+        self._v = beta2 * self._v + (1 - beta2) * gradient**2
+        m_hat = self._m / (1 - beta1**self._steps)
+        v_hat = self._v / (1 - beta2**self._steps)
+        self.theta -= self.learning_rate * m_hat / (np.sqrt(v_hat) + 1e-8)
+
+    def epoch(self, rng: np.random.Generator) -> float:
+        """
+        One pass over the dataset in shuffled minibatches
+
+        Minibatches are contiguous slices visited in random order so reads
+        from the memory map stay sequential.
+
+        Returns:
+            float: Mean squared error over the pass
+        """
+        starts = np.arange(0, self.size, self.batch_size)
+        rng.shuffle(starts)
+        total_loss = 0.0
+        pool = None
+        if self.processes > 1:
+            pool = multiprocessing.Pool(
+                self.processes, initializer=_open_in_worker, initargs=(self.path,)
+            )
+        try:
+            for start in starts:
+                stop = min(start + self.batch_size, self.size)
+                gradient, loss = self._gradient(int(start), int(stop), pool)
+                self._step(gradient, stop - start)
+                total_loss += loss
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return total_loss / max(self.size, 1)
+
+    def tuned_params(self) -> EvalParams:
+        return vector_to_params(self.theta, self.params.mobility)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Tune evaluation weights against game results (Texel method)"
+    )
+    parser.add_argument("dataset", type=Path, help="File written by dataset.py")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Parameters file, defaults to the one the engine loads",
+    )
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=16384)
+    parser.add_argument("--lr", type=float, default=1.0, help="Adam step size")
+    parser.add_argument("--k", type=float, default=None, help="Skip fitting k")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=1, help="Worker processes"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Use the first N positions only"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tuner = Tuner(
+        args.dataset,
+        batch_size=args.batch_size,
+        learning_rate=args.lr,
+        processes=args.processes,
+        limit=args.limit,
+    )
+    if args.k is None:
+        print(f"Fitted k = {tuner.fit_k():.4f}")
+    else:
+        tuner.k = args.k
+
+    rng = np.random.default_rng(args.seed)
+    for epoch in range(1, args.epochs + 1):
+        start = time.perf_counter()
+        loss = tuner.epoch(rng)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Epoch {epoch}: loss {loss:.6f} in {elapsed:.1f}s "
+            f"({tuner.size / elapsed if elapsed else 0:.0f} positions/s)"
+        )
+
+    output = args.output or default_params_path()
+    tuner.tuned_params().save(output)
+    print(f"Parameters written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from typing import TextIO
+
+from core import Color
+from engine import UCI_RE, Engine, Move
+from search import SearchLimits, SearchResult, Searcher, TranspositionTable
+
+ENGINE_NAME = "ChessEngine"
+ENGINE_AUTHOR = "ChessEngine developers"
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+
+# Positions searched by the bench command, a mix of openings, middlegames and
+# endgames so that every kind of move is generated
+BENCH_POSITIONS = (
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1",
+)
+DEFAULT_BENCH_DEPTH = 2
+
+
+def _perft_root_move(args: tuple[str, Move, int]) -> int:
+    """Perft below one root move, run in a worker process"""
+    fen, move, depth = args
+    engine = Engine()
+    engine.load_fen_notation(fen)
+    engine.make_move(*move)
+    return engine.perft(depth - 1)
+
+
+class UciSession:
+    """
+    State of one UCI conversation: the position, options and running search
+
+    Commands are handled one at a time by handle(). Searches run on their own
+    thread so that stop, isready and quit are answered while they think.
+    """
+
+    def __init__(self, output: TextIO = sys.stdout):
+        self.output = output
+        self._output_lock = threading.Lock()
+        self.engine = Engine()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.table = TranspositionTable(self.hash_mb)
+        self.threads = 1
+        self.searcher: Searcher | None = None
+        self._worker: threading.Thread | None = None
+        self._perft_stop = threading.Event()
+
+    def send(self, line: str) -> None:
+        with self._output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line: str) -> bool:
+        """
+        Run one command
+
+        Args:
+            line (str): A line of UCI input
+
+        Returns:
+            bool: False once quit was received
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(
+                f"option name Hash type spin default {DEFAULT_HASH_MB} "
+                f"min 1 max {MAX_HASH_MB}"
+            )
+            self.send(
+                f"option name Threads type spin default 1 min 1 max {MAX_THREADS}"
+            )
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.table.clear()
+            self.engine.load_fen_notation()
+        elif command == "setoption":
+            self._set_option(args)
+        elif command == "position":
+            self.stop()
+            self._set_position(args)
+        elif command == "go":
+            self.stop()
+            self._go(args)
+        elif command == "bench":
+            self.stop()
+            try:
+                depth = int(args[0]) if args else DEFAULT_BENCH_DEPTH
+            except ValueError:
+                self.send(f"info string Invalid bench depth: {args[0]}")
+            else:
+                self._start(self._bench, depth)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        elif command == "d":
+            self.send(self.engine.get_fen_notation())
+        else:
+            self.send(f"info string Unknown command: {line.strip()}")
+        return True
+
+    def stop(self) -> None:
+        """Interrupt the running search or perft, waiting for it to end"""
+        if self.searcher is not None:
+            self.searcher.stop()
+        self._perft_stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _start(self, target, *args) -> None:
+        self._worker = threading.Thread(target=target, args=args, daemon=True)
+        self._worker.start()
+
+    def _set_option(self, args: list[str]) -> None:
+        # setoption name <name> [value <value>], names may contain spaces
+        text = " ".join(args)
+        if not text.startswith("name "):
+            return
+        name, _, value = text[5:].partition(" value ")
+        name = name.strip().lower()
+        try:
+            if name == "hash":
+                self.stop()
+                self.hash_mb = min(max(int(value), 1), MAX_HASH_MB)
+                self.table.resize(self.hash_mb)
+            elif name == "threads":
+                self.threads = min(max(int(value), 1), MAX_THREADS)
+            else:
+                self.send(f"info string Unknown option: {name}")
+        except ValueError:
+            self.send(f"info string Invalid value for {name}: {value}")
+
+    def _set_position(self, args: list[str]) -> None:
+        # position startpos|fen <fen> [moves <move>...]
+        moves: list[str] = []
+        if "moves" in args:
+            split = args.index("moves")
+            args, moves = args[:split], args[split + 1 :]
+
+        try:
+            if args and args[0] == "fen":
+                self.engine.load_fen_notation(" ".join(args[1:]))
+            else:
+                self.engine.load_fen_notation()
+            for uci in moves:
+                self.engine.make_move(*self.engine.uci_to_move(uci))
+        except (ValueError, KeyError, IndexError) as e:
+            self.send(f"info string Invalid position: {e}")
+
+    def _go(self, args: list[str]) -> None:
+        if args and args[0] == "perft":
+            try:
+                depth = int(args[1]) if len(args) > 1 else 1
+            except ValueError:
+                self.send(f"info string Invalid perft depth: {args[1]}")
+                return
+            self._perft_stop = threading.Event()
+            self._start(self._perft, depth, self._perft_stop)
+            return
+
+        values: dict[str, int] = {}
+        infinite = False
+        searchmoves = None
+        i = 0
+        while i < len(args):
+            if args[i] == "infinite":
+                infinite = True
+            elif args[i] == "searchmoves":
+                searchmoves = []
+                while i + 1 < len(args) and UCI_RE.match(args[i + 1]):
+                    i += 1
+                    try:
+                        searchmoves.append(self.engine.uci_to_move(args[i]))
+                    except ValueError as e:
+                        self.send(f"info string Ignored searchmove: {e}")
+            elif i + 1 < len(args):
+                try:
+                    values[args[i]] = int(args[i + 1])
+                    i += 1
+                except ValueError:
+                    # A flag such as ponder, the next word is its own key
+                    pass
+            i += 1
+
+        movetime = values.get("movetime")
+        white = self.engine.active_color == Color.WHITE
+        time_left = values.get("wtime" if white else "btime")
+        if movetime is None and time_left is not None:
+            increment = values.get("winc" if white else "binc", 0)
+            moves_to_go = values.get("movestogo", 30)
+            # Spend an even share of the clock, keeping a margin for overhead
+            movetime = time_left // max(moves_to_go, 1) + increment // 2
+            movetime = max(min(movetime, time_left - 50), 10)
+
+        limits = SearchLimits(
+            depth=values.get("depth"),
+            movetime_ms=movetime,
+            nodes=values.get("nodes"),
+            infinite=infinite,
+            searchmoves=searchmoves,
+        )
+        self.searcher = Searcher(self.engine, self.table)
+        self._start(self._search, self.searcher, limits)
+
+    def _search(self, searcher: Searcher, limits: SearchLimits) -> None:
+        result = searcher.search(limits, self._send_info)
+        # In infinite mode the GUI expects bestmove only after stop
+        if limits.infinite:
+            searcher.stop_event.wait()
+        if result.best_move is None:
+            self.send("bestmove 0000")
+        else:
+            self.send(f"bestmove {self.engine.move_to_uci(*result.best_move)}")
+
+    def _send_info(self, result: SearchResult) -> None:
+        score = (
+            f"mate {result.mate}" if result.mate is not None else f"cp {result.score}"
+        )
+        # Called between iterations, when the search engine is back at the root
+        pv = []
+        played = 0
+        for move in result.pv:
+            pv.append(self.engine.move_to_uci(*move))
+            if not self.engine.make_move(*move):
+                break
+            played += 1
+        for _ in range(played):
+            self.engine.undo_move()
+        self.send(
+            f"info depth {result.depth} score {score} nodes {result.nodes} "
+            f"nps {result.nps} time {result.time_ms} pv {' '.join(pv)}"
+        )
+
+    def _perft(self, depth: int, stop: threading.Event) -> None:
+        """
+        Print the node count below every root move, then the total
+
+        Once stop is set the count ends without a report, the worker
+        processes are terminated rather than waited for.
+        """
+        start = time.perf_counter()
+        moves = self.engine.legal_moves()
+        if self.threads > 1 and depth > 1:
+            fen = self.engine.get_fen_notation()
+            with multiprocessing.Pool(min(self.threads, len(moves) or 1)) as pool:
+                pending = pool.map_async(
+                    _perft_root_move, [(fen, m, depth) for m in moves]
+                )
+                while not pending.ready():
+                    if stop.wait(0.05):
+                        pool.terminate()
+                        break
+                counts = pending.get() if pending.ready() else []
+        else:
+            counts = []
+            for move in moves:
+                if stop.is_set():
+                    break
+                self.engine.make_move(*move)
+                try:
+                    counts.append(self.engine.perft(depth - 1, stop))
+                finally:
+                    self.engine.undo_move()
+
+        if stop.is_set():
+            self.send("info string perft stopped")
+            return
+        for move, count in zip(moves, counts):
+            self.send(f"{self.engine.move_to_uci(*move)}: {count}")
+        total = sum(counts)
+        elapsed = time.perf_counter() - start
+        self.send("")
+        self.send(f"Nodes searched: {total}")
+        self.send(
+            f"Time: {elapsed * 1000:.0f} ms, NPS: {total / max(elapsed, 1e-9):.0f}"
+        )
+
+    def _bench(self, depth: int) -> None:
+        """Search a fixed set of positions and report the overall speed"""
+        nodes = 0
+        start = time.perf_counter()
+        for fen in BENCH_POSITIONS:
+            engine = Engine()
+            engine.load_fen_notation(fen)
+            self.searcher = Searcher(engine, TranspositionTable(self.hash_mb))
+            result = self.searcher.search(SearchLimits(depth=depth))
+            nodes += result.nodes
+            if self.searcher.stop_event.is_set():
+                break
+        elapsed = time.perf_counter() - start
+
+        self.send(f"Nodes searched: {nodes}")
+        self.send(
+            f"Time: {elapsed * 1000:.0f} ms, NPS: {nodes / max(elapsed, 1e-9):.0f}"
+        )
+
+
+def _read_input(lines: queue.Queue, source: TextIO) -> None:
+    """Forward input lines to the command loop, None marks the end of input"""
+    for line in source:
+        lines.put(line)
+    lines.put(None)
+
+
+def main() -> None:
+    session = UciSession()
+    lines: queue.Queue = queue.Queue()
+    # Input is read on its own thread so the loop stays free to act on stop
+    threading.Thread(target=_read_input, args=(lines, sys.stdin), daemon=True).start()
+
+    while True:
+        line = lines.get()
+        if line is None:
+            session.stop()
+            break
+        if not session.handle(line):
+            break
+
+
+if __name__ == "__main__":
+    main()